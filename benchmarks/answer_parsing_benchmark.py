@@ -0,0 +1,139 @@
+"""
+Old strict parser vs the tolerant streaming parser on synthetic Gemini answers.
+
+  strict    - strip ```json fences, json.loads the whole text (the pre-schema
+              parser; needs the complete response)
+  tolerant  - src.answer_parser.StreamingAnswerParser fed chunk by chunk;
+              answers as soon as tool_name and category are complete
+
+The corpus is synthetic: a made-up mix of the answer shapes free-text prompting
+can produce (clean JSON, fences, a sentence before or after, truncated output,
+fields out of order) with long extracted_content for resources (and sometimes
+for other answers). With response_mime_type=application/json the prose and
+fence shapes barely occur, so the failure rates below show which shapes each
+parser survives, not the production rate; that is exported live as
+reellink_gemini_strict_parse_failures_total / reellink_gemini_strict_parse_checked_total.
+Time-to-answer (tta) is simulated from how much of the stream each parser has
+to read, at --chars-per-second.
+
+Usage:
+    python benchmarks/answer_parsing_benchmark.py [--answers 5000] [--chars-per-second 400] [--seed 1]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+CHUNK_CHARS = 64
+TOOLS = ["CapCut", "Notion AI", "Perplexity", "Cursor", "ChatGPT Prompt Pack", "Lovable", "n8n"]
+CATEGORIES = ["website", "mobile_app", "github_repo", "resource"]
+
+
+def make_answer(rng) -> tuple:
+    """Returns (shape, category, text)."""
+    category = rng.choice(CATEGORIES)
+    content = None
+    # Resources carry a transcription; other answers sometimes do too (on-screen
+    # text the model transcribed anyway), which nobody reads.
+    if category == "resource" or rng.random() < 0.3:
+        content = "\n".join(f"Prompt {i}: act as an expert and {rng.random():.6f}" for i in range(rng.randrange(20, 200)))
+    fields = {"tool_name": rng.choice(TOOLS), "category": category, "extracted_content": content}
+    if rng.random() < 0.05:
+        category = "N/A"
+        fields = {"tool_name": "N/A", "category": "N/A", "extracted_content": None}
+    body = json.dumps(fields)
+    shape = rng.choices(
+        ["clean", "fenced", "prose_before", "prose_after", "truncated", "content_first"],
+        weights=[50, 25, 8, 7, 5, 5],
+    )[0]
+    if shape == "fenced":
+        return shape, category, f"```json\n{body}\n```"
+    if shape == "prose_before":
+        return shape, category, f"Here is the JSON you asked for:\n{body}"
+    if shape == "prose_after":
+        return shape, category, f"{body}\nLet me know if you need anything else!"
+    if shape == "truncated":
+        return shape, category, body[: max(len(body) - rng.randrange(5, 40), len(body) // 2)]
+    if shape == "content_first":
+        return shape, category, json.dumps({"extracted_content": content, "category": category, "tool_name": fields["tool_name"]})
+    return shape, category, body
+
+
+def tolerant_read(text: str) -> tuple:
+    """Feeds the answer in chunks; returns (data, chars read before the answer was usable)."""
+    from src.answer_parser import StreamingAnswerParser
+
+    parser = StreamingAnswerParser()
+    for start in range(0, len(text), CHUNK_CHARS):
+        parser.feed(text[start:start + CHUNK_CHARS])
+        if parser.ready:
+            return parser.result(), min(len(text), start + CHUNK_CHARS)
+    return parser.result(), len(text)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--answers", type=int, default=5000)
+    parser.add_argument("--chars-per-second", type=float, default=400.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    from src.answer_parser import parse_strict
+
+    rng = random.Random(args.seed)
+    corpus = [make_answer(rng) for _ in range(args.answers)]
+
+    failures = {"strict": 0, "tolerant": 0}
+    by_shape = {}
+    answer_s = {"strict": [], "tolerant": []}
+    non_resource_s = {"strict": [], "tolerant": []}
+    cpu = {"strict": 0.0, "tolerant": 0.0}
+    for shape, category, text in corpus:
+        started = time.perf_counter()
+        strict_data, strict_error = parse_strict(text)
+        cpu["strict"] += time.perf_counter() - started
+        started = time.perf_counter()
+        tolerant_data, chars_read = tolerant_read(text)
+        cpu["tolerant"] += time.perf_counter() - started
+
+        stats = by_shape.setdefault(shape, {"count": 0, "strict": 0, "tolerant": 0})
+        stats["count"] += 1
+        if strict_error:
+            failures["strict"] += 1
+            stats["strict"] += 1
+        if tolerant_data is None:
+            failures["tolerant"] += 1
+            stats["tolerant"] += 1
+        answer_s["strict"].append(len(text) / args.chars_per_second)
+        answer_s["tolerant"].append(chars_read / args.chars_per_second)
+        if category != "resource":
+            non_resource_s["strict"].append(answer_s["strict"][-1])
+            non_resource_s["tolerant"].append(answer_s["tolerant"][-1])
+
+    print(f"{args.answers} synthetic answers (made-up shape mix, not production rates), "
+          f"streamed in {CHUNK_CHARS}-char chunks at {args.chars_per_second:.0f} chars/s\n")
+    print(f"{'shape':<14} {'count':>6} {'strict fail':>12} {'tolerant fail':>14}")
+    for shape, stats in sorted(by_shape.items()):
+        print(f"{shape:<14} {stats['count']:>6} {stats['strict']:>12} {stats['tolerant']:>14}")
+    print(f"{'total':<14} {args.answers:>6} {failures['strict']:>12} {failures['tolerant']:>14}\n")
+
+    print(f"{'parser':<9} {'fail rate':>9} {'mean tta':>9} {'p50 tta':>8} {'p95 tta':>8} {'cpu/answer':>11}")
+    for name in ("strict", "tolerant"):
+        times = sorted(answer_s[name])
+        print(f"{name:<9} {failures[name] / args.answers:>8.1%} {statistics.mean(times):>8.2f}s "
+              f"{times[len(times) // 2]:>7.2f}s {times[int(len(times) * 0.95)]:>7.2f}s "
+              f"{cpu[name] / args.answers * 1e6:>9.1f}us")
+    print(f"\nnon-resource answers (extracted_content not needed): mean tta "
+          f"strict {statistics.mean(non_resource_s['strict']):.2f}s, "
+          f"tolerant {statistics.mean(non_resource_s['tolerant']):.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Event-loop lag with synchronous vs queue-based logging.
+
+Simulates the bot's logging pattern under load: many concurrent "reels", each
+logging the user's message, the raw Gemini response and the parsed tool_data.
+A LoopLagMonitor samples the loop every few milliseconds while that runs.
+
+  sync       - the old setup: logging.FileHandler + StreamHandler on the root logger
+  queue-full - src.logging_setup.configure_logging() with LOG_MAX_MESSAGE_CHARS=0
+               (background writer and JSON, no truncation)
+  queue      - src.logging_setup.configure_logging() as configured (plus truncation)
+
+sync vs queue-full isolates the background writer; queue-full vs queue shows
+what truncation adds on top. Each mode runs in its own interpreter so the
+logging configuration can't leak.
+
+Usage:
+    python benchmarks/logging_lag_benchmark.py [--reels 200] [--payload-kb 16]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+DUMMY_ENV = {
+    "TELEGRAM_BOT_TOKEN": "123456:benchmark-token",
+    "GEMINI_API_KEY": "benchmark",
+    "GOOGLE_API_KEY": "benchmark",
+    "GOOGLE_CSE_ID": "benchmark",
+}
+# Mode -> extra environment for its interpreter.
+MODES = {
+    "sync": {},
+    "queue-full": {"LOG_MAX_MESSAGE_CHARS": "0"},
+    "queue": {},
+}
+
+
+async def simulate_reel(logger, index: int, payload: str, spent: list):
+    tool_data = {"tool_name": f"Tool {index}", "category": "resource", "extracted_content": payload}
+    messages = [
+        f"User {index} sent message: https://www.instagram.com/reel/{index:011d}/ {payload[:200]}",
+        f"Raw Gemini Response Text: {payload}",
+        f"Successfully parsed JSON: {tool_data}",
+        f"AI extracted data: {tool_data}. Now finding direct link.",
+    ]
+    # Stagger the reels so the lag monitor gets to run in between.
+    await asyncio.sleep(index * 0.001)
+    for message in messages:
+        started = time.perf_counter()
+        logger.info(message)
+        spent.append(time.perf_counter() - started)
+        await asyncio.sleep(0)
+
+
+async def run_workload(reels: int, payload_kb: int) -> dict:
+    import logging
+    from src.loop_monitor import LoopLagMonitor
+
+    monitor = LoopLagMonitor(interval=0.001, window=100000, warn_after=float("inf"))
+    monitor_task = asyncio.create_task(monitor.run())
+    await asyncio.sleep(0.05)
+
+    logger = logging.getLogger("src.bench")
+    payload = ("lorem ipsum dolor sit amet " * (payload_kb * 40))[: payload_kb * 1024]
+    spent = []
+    await asyncio.gather(*(simulate_reel(logger, i, payload, spent) for i in range(reels)))
+    await asyncio.sleep(0.05)
+    monitor_task.cancel()
+
+    result = monitor.summary()
+    result["log_calls_s"] = sum(spent)
+    return result
+
+
+def child(mode: str, reels: int, payload_kb: int, log_dir: str):
+    import logging
+    log_file = os.path.join(log_dir, f"{mode}.log")
+    devnull = open(os.devnull, "w")
+    if mode == "sync":
+        logging.basicConfig(
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            level=logging.INFO,
+            handlers=[logging.FileHandler(log_file), logging.StreamHandler(devnull)],
+        )
+    else:
+        from src.logging_setup import configure_logging, stop_logging
+        configure_logging(log_file=log_file, console_stream=devnull)
+
+    result = asyncio.run(run_workload(reels, payload_kb))
+    if mode != "sync":
+        stop_logging()
+    result["log_bytes"] = os.path.getsize(log_file)
+    print(json.dumps(result))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reels", type=int, default=200)
+    parser.add_argument("--payload-kb", type=int, default=16)
+    parser.add_argument("--mode", choices=list(MODES), help=argparse.SUPPRESS)
+    parser.add_argument("--log-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        child(args.mode, args.reels, args.payload_kb, args.log_dir)
+        return 0
+
+    results = {}
+    with tempfile.TemporaryDirectory() as log_dir:
+        for mode, mode_env in MODES.items():
+            env = dict(os.environ)
+            env.update(DUMMY_ENV)
+            env.update(mode_env)
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--mode", mode, "--log-dir", log_dir,
+                 "--reels", str(args.reels), "--payload-kb", str(args.payload_kb)],
+                cwd=PROJECT_ROOT, env=env, capture_output=True, text=True,
+            )
+            if completed.returncode != 0:
+                print(completed.stderr)
+                return 1
+            results[mode] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    print(f"{args.reels} reels x 4 log calls, {args.payload_kb} KB payloads")
+    print(f"{'mode':<10} {'p50 lag':>10} {'p99 lag':>10} {'max lag':>10} {'in logger':>10} {'log size':>10}")
+    for mode, r in results.items():
+        print(f"{mode:<10} {r['p50_ms']:>8.2f}ms {r['p99_ms']:>8.2f}ms {r['max_ms']:>8.2f}ms "
+              f"{r['log_calls_s'] * 1000:>8.1f}ms {r['log_bytes'] / 1024:>8.0f}KB")
+    sync, full, truncated = results["sync"], results["queue-full"], results["queue"]
+    print(f"\nEvent-loop time saved by the queue-based writer alone (sync -> queue-full): "
+          f"{(sync['log_calls_s'] - full['log_calls_s']) * 1000:.1f} ms "
+          f"(p99 lag {sync['p99_ms']:.2f} -> {full['p99_ms']:.2f} ms)")
+    print(f"Further saved by truncation (queue-full -> queue): "
+          f"{(full['log_calls_s'] - truncated['log_calls_s']) * 1000:.1f} ms, "
+          f"log size {full['log_bytes'] / 1024:.0f} KB -> {truncated['log_bytes'] / 1024:.0f} KB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Event-loop lag with CPU-bound work inline vs offloaded to the worker pool.
+
+Runs the CPU work the pipeline offloads per reel - SHA-256 of the downloaded
+video - for a batch of concurrent "reels", while a LoopLagMonitor samples the
+loop every millisecond. (Gemini's answer is parsed incrementally in the
+thread that reads its stream, see src.answer_parser, so it isn't measured here.)
+
+  inline - the work runs directly on the event loop
+  pool   - the work goes through src.workers.worker_pool
+
+Usage:
+    python benchmarks/offload_lag_benchmark.py [--reels 20] [--video-mb 30]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+# Dummy secrets so src.config's sanity check passes without a real .env file.
+for key, value in {
+    "TELEGRAM_BOT_TOKEN": "123456:benchmark-token",
+    "GEMINI_API_KEY": "benchmark",
+    "GOOGLE_API_KEY": "benchmark",
+    "GOOGLE_CSE_ID": "benchmark",
+}.items():
+    os.environ.setdefault(key, value)
+
+
+async def run_mode(mode: str, reels: int, video_path: str, warmup_path: str) -> dict:
+    from src.cpu_tasks import hash_file
+    from src.loop_monitor import LoopLagMonitor
+    from src.workers import worker_pool
+
+    async def reel():
+        if mode == "inline":
+            hash_file(video_path)
+        else:
+            await worker_pool.run(hash_file, video_path)
+
+    if mode == "pool":
+        # Start the workers before measuring; spawn start-up is a one-off cost.
+        await worker_pool.run(hash_file, warmup_path)
+
+    monitor = LoopLagMonitor(interval=0.001, window=1000000, warn_after=float("inf"))
+    monitor_task = asyncio.create_task(monitor.run())
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    await asyncio.gather(*(reel() for _ in range(reels)))
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(0.05)
+    monitor_task.cancel()
+
+    result = monitor.summary()
+    result["wall_s"] = elapsed
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reels", type=int, default=20)
+    parser.add_argument("--video-mb", type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as f:
+        f.write(os.urandom(args.video_mb * 1024 * 1024))
+        video_path = f.name
+    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as f:
+        warmup_path = f.name
+
+    try:
+        results = {mode: asyncio.run(run_mode(mode, args.reels, video_path, warmup_path)) for mode in ("inline", "pool")}
+    finally:
+        os.remove(video_path)
+        os.remove(warmup_path)
+
+    from src.workers import worker_pool
+    print(f"{args.reels} reels: SHA-256 of {args.video_mb} MB each ({worker_pool.max_workers} workers)")
+    print(f"{'mode':<7} {'p50 lag':>10} {'p99 lag':>10} {'max lag':>10} {'wall':>9}")
+    for mode, r in results.items():
+        print(f"{mode:<7} {r['p50_ms']:>8.2f}ms {r['p99_ms']:>8.2f}ms {r['max_ms']:>8.2f}ms {r['wall_s']:>8.2f}s")
+    worker_pool.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Cold-start benchmark for the bot and API entry points.
+
+Each measurement runs in a fresh interpreter so nothing is served from an
+already-populated sys.modules. The script fails (exit code 1) when a budget is
+exceeded, when a heavy client gets imported eagerly again or when a probe
+crashes (e.g. a broken import), so it can run in CI.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs 5] [--import-budget 1.5] [--startup-budget 2.5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# These must only load on first use (or in the background warm-up).
+LAZY_MODULES = [
+    "google.generativeai",
+    "googleapiclient.discovery",
+    "instagrapi",
+]
+
+# Dummy secrets so src.config's sanity check passes without a real .env file.
+DUMMY_ENV = {
+    "TELEGRAM_BOT_TOKEN": "123456:benchmark-token",
+    "GEMINI_API_KEY": "benchmark",
+    "GOOGLE_API_KEY": "benchmark",
+    "GOOGLE_CSE_ID": "benchmark",
+}
+
+# Each probe prints a JSON line: elapsed seconds and which lazy modules got loaded.
+PROBE_TEMPLATE = """
+import json, sys, time
+started = time.perf_counter()
+{body}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"elapsed": elapsed, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+PROBES = {
+    # Import cost of the bot module (what main.py pays before polling).
+    "import src.bot": ("import", "import src.bot"),
+    # Import cost of main.py itself (scheduler + PID handling).
+    "import main": ("import", "import main"),
+    # Import cost of the FastAPI wrapper; the bot is imported on its executor thread.
+    "import src.api": ("import", "import src.api"),
+    # Import + building the Telegram Application, i.e. everything before run_polling().
+    "build application": ("startup", "import src.bot\nsrc.bot.build_application()"),
+}
+
+
+def run_probe(body: str) -> dict:
+    env = dict(os.environ)
+    env.update(DUMMY_ENV)
+    code = PROBE_TEMPLATE.format(body=body, lazy=LAZY_MODULES)
+    completed = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr else "probe failed")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per probe.")
+    parser.add_argument("--import-budget", type=float, default=1.5, help="Max median seconds for an import probe.")
+    parser.add_argument("--startup-budget", type=float, default=2.5, help="Max median seconds for a startup probe.")
+    args = parser.parse_args()
+
+    budgets = {"import": args.import_budget, "startup": args.startup_budget}
+    failures = []
+
+    print(f"{'probe':<20} {'median':>8} {'max':>8} {'budget':>8}  status")
+    for name, (kind, body) in PROBES.items():
+        try:
+            samples = [run_probe(body) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{name:<20} {'-':>8} {'-':>8} {budgets[kind]:>8.2f}  ERROR ({e})")
+            failures.append(f"{name}: probe failed: {e}")
+            continue
+
+        timings = [s["elapsed"] for s in samples]
+        median = statistics.median(timings)
+        eager = sorted({m for s in samples for m in s["loaded"]})
+        status = "ok"
+        if median > budgets[kind]:
+            status = "OVER BUDGET"
+            failures.append(f"{name}: {median:.2f}s > {budgets[kind]:.2f}s")
+        if eager:
+            status = f"EAGER IMPORTS: {', '.join(eager)}"
+            failures.append(f"{name}: eagerly imported {', '.join(eager)}")
+        print(f"{name:<20} {median:>8.3f} {max(timings):>8.3f} {budgets[kind]:>8.2f}  {status}")
+
+    if failures:
+        print("\nStartup regressions:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+End-to-end "video ready in Gemini" time: streamed upload vs temp-file path.
+
+  temp_file - download to a media buffer, then genai.upload_file() from disk
+  streamed  - download and resumable upload overlap (src.streaming_upload)
+
+Needs real credentials (.env), network access and, for reel URLs, yt-dlp plus
+instagram_cookies.txt. Uploaded files are deleted after each run.
+
+Usage:
+    python benchmarks/upload_pipeline_benchmark.py <reel or direct video URL> [--runs 3] [--direct]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+os.chdir(PROJECT_ROOT)  # instagram_cookies.txt is looked up relative to the project
+
+
+async def temp_file_run(video_url: str) -> float:
+    from src.extractor import delete_uploaded_file, get_genai
+    from src.media_buffers import media_buffers
+    from src.processor import stream_video_to_temp_file
+
+    genai = await asyncio.to_thread(get_genai)
+    started = time.perf_counter()
+    path = await stream_video_to_temp_file(video_url)
+    if not path or path == "TIMEOUT":
+        raise RuntimeError("download failed")
+    try:
+        video_file = await asyncio.to_thread(genai.upload_file, path=path, display_name=os.path.basename(path))
+        elapsed = time.perf_counter() - started
+        await delete_uploaded_file(video_file.name)
+        return elapsed
+    finally:
+        await media_buffers.release(path)
+
+
+async def streamed_run(video_url: str) -> float:
+    from src.extractor import delete_uploaded_file
+    from src.media_buffers import media_buffers
+    from src.processor import stream_video_to_gemini
+
+    timings = {}
+    started = time.perf_counter()
+    path, file_name = await stream_video_to_gemini(video_url, timings)
+    elapsed = time.perf_counter() - started
+    try:
+        if not file_name:
+            raise RuntimeError("streaming upload fell back to the temp-file path")
+        await delete_uploaded_file(file_name)
+        return elapsed
+    finally:
+        await media_buffers.release(path)
+
+
+async def main_async(args) -> int:
+    from src.processor import resolve_video_info
+
+    video_url = args.url
+    if not args.direct:
+        video_info = await resolve_video_info(args.url)
+        if not video_info:
+            print("yt-dlp could not resolve the reel.")
+            return 1
+        video_url = video_info["video_url"]
+
+    results = {"temp_file": [], "streamed": []}
+    for run in range(args.runs):
+        # Alternate the order so CDN caching doesn't favour one mode.
+        order = ("temp_file", "streamed") if run % 2 == 0 else ("streamed", "temp_file")
+        for mode in order:
+            runner = temp_file_run if mode == "temp_file" else streamed_run
+            results[mode].append(await runner(video_url))
+            print(f"run {run + 1} {mode:<9} {results[mode][-1]:.2f}s")
+
+    temp_median = statistics.median(results["temp_file"])
+    streamed_median = statistics.median(results["streamed"])
+    print(f"\nmedian video-ready time: temp_file {temp_median:.2f}s, streamed {streamed_median:.2f}s "
+          f"({(1 - streamed_median / temp_median) * 100:.0f}% faster)")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--direct", action="store_true", help="URL is already a direct video URL (skip yt-dlp).")
+    return asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
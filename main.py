@@ -1,6 +1,8 @@
 import logging
+import os
 import sys
 import atexit
+from datetime import datetime
 import psutil  # Use the more reliable psutil library
 from apscheduler.schedulers.background import BackgroundScheduler
 from src.refresh_cookies import refresh_session  # Import your script
@@ -13,10 +15,12 @@ PID_FILE = "bot.pid"
 
 def start_scheduler():
     scheduler = BackgroundScheduler()
-    # Schedule the refresh to run every 24 hours
-    scheduler.add_job(func=refresh_session, trigger="interval", hours=24)
+    # Schedule the refresh to run every 24 hours, with the first run starting
+    # immediately on the scheduler thread so the bot can begin polling while
+    # the Instagram login is still in progress.
+    scheduler.add_job(func=refresh_session, trigger="interval", hours=24, next_run_time=datetime.now())
     scheduler.start()
-    print("Internal Scheduler Started: Cookies will refresh every 24h.")
+    print("Internal Scheduler Started: Cookies refresh now in the background, then every 24h.")
 
     # Shut down the scheduler when exiting the app
     atexit.register(lambda: scheduler.shutdown())
@@ -87,15 +91,11 @@ def main_with_pid_check():
         logging.error(f"Failed to write PID file: {e}")
         sys.exit(1)
         
-    # 1. Run it once immediately so we have fresh cookies NOW
-    print("Performing initial cookie refresh...")
-    if not refresh_session():
-        print("Initial Instagram cookie refresh failed. Continuing with existing cookies (if any).")
-
-    # 2. Start the timer for the future
+    # 1. Start the cookie refresh timer. The first refresh runs right away in the
+    #    background; until it finishes, yt-dlp uses the existing cookies (if any).
     start_scheduler()
 
-    # 3. Start your Bot
+    # 2. Start your Bot
     from src.bot import main
     try:
         main()
@@ -0,0 +1,170 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from .config import (
+    ANALYTICS_BATCH_SIZE,
+    ANALYTICS_ENABLED,
+    ANALYTICS_FLUSH_SECONDS,
+    ANALYTICS_QUEUE_MAX,
+    ANALYTICS_RAW_RETENTION_DAYS,
+    ANALYTICS_ROLLUP_SECONDS,
+)
+from .links import match_link
+from .metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+# process_reel() timing keys -> ScanEvent latency columns
+STAGE_COLUMNS = {
+    "resolve_s": "resolve_ms",
+    "download_s": "download_ms",
+    "upload_s": "upload_ms",
+    "processing_s": "processing_ms",
+    "inference_s": "inference_ms",
+    "total_s": "total_ms",
+}
+# Events folded into the hourly tables per rollup transaction. Kept small so
+# the SQLite write lock is only held briefly; user registration waits on it.
+ROLLUP_CHUNK = 500
+
+
+def scan_outcome(result: dict) -> str:
+    tool_name = (result or {}).get("tool_name")
+    if tool_name == "Error":
+        return "error"
+    if not tool_name or tool_name == "N/A":
+        return "not_found"
+    return "found"
+
+
+class ScanRecorder:
+    """
+    Records one event per user scan (platform, outcome and timings, never the
+    link itself) without touching the database on the caller's thread:
+    record() only builds a dict and puts it on a queue. A background thread
+    writes events in batches (every ANALYTICS_BATCH_SIZE events or
+    ANALYTICS_FLUSH_SECONDS) and periodically runs the hourly rollup.
+    """
+
+    def __init__(self, batch_size: int, flush_seconds: float, queue_max: int, rollup_seconds: float):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.rollup_seconds = rollup_seconds
+        self._queue = queue.Queue(maxsize=queue_max)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        # Counters exported as metrics
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.write_failures = 0
+        self.rolled_up = 0
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="scan-analytics", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def stop(self, timeout: float = 10.0):
+        """Flushes queued events and stops the writer."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def record(self, telegram_id: int, reel_url: str, result: dict, outcome: str = None):
+        """Queues a scan event. Never blocks; drops the event if the writer is far behind."""
+        if not ANALYTICS_ENABLED:
+            return
+        link = match_link(reel_url)
+        timings = (result or {}).get("timings") or {}
+        event = {
+            "created_at": datetime.utcnow(),
+            "telegram_id": telegram_id,
+            "platform": link.platform if link else "other",
+            "outcome": outcome or scan_outcome(result),
+            "cache_hit": bool((result or {}).get("cache_hit")),
+        }
+        for stage, column in STAGE_COLUMNS.items():
+            if stage in timings:
+                event[column] = int(timings[stage] * 1000)
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(event)
+            self.recorded += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    # --- Writer Thread ---
+    def _next_batch(self):
+        """Blocks for the first event, then collects more until the batch is full or the flush interval ends."""
+        batch = []
+        deadline = time.monotonic() + self.flush_seconds
+        stopping = False
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                event = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if event is None:
+                stopping = True
+                break
+            batch.append(event)
+        return batch, stopping
+
+    def _run(self):
+        from .database import insert_scan_events, prune_scan_events, rollup_scan_events
+
+        next_rollup = time.monotonic() + self.rollup_seconds
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if batch:
+                try:
+                    insert_scan_events(batch)
+                    self.written += len(batch)
+                except Exception as e:
+                    self.write_failures += 1
+                    self.dropped += len(batch)
+                    logger.error(f"Could not write {len(batch)} scan events: {e}")
+            if stopping or time.monotonic() >= next_rollup:
+                next_rollup = time.monotonic() + self.rollup_seconds
+                try:
+                    while True:
+                        rolled = rollup_scan_events(limit=ROLLUP_CHUNK)
+                        self.rolled_up += rolled
+                        if rolled < ROLLUP_CHUNK:
+                            break
+                    prune_scan_events(datetime.utcnow() - timedelta(days=ANALYTICS_RAW_RETENTION_DAYS))
+                except Exception as e:
+                    logger.error(f"Scan analytics rollup failed: {e}")
+
+
+scan_recorder = ScanRecorder(ANALYTICS_BATCH_SIZE, ANALYTICS_FLUSH_SECONDS, ANALYTICS_QUEUE_MAX, ANALYTICS_ROLLUP_SECONDS)
+
+def _collect():
+    return [
+        ("reellink_scan_events_recorded_total", {}, scan_recorder.recorded),
+        ("reellink_scan_events_written_total", {}, scan_recorder.written),
+        ("reellink_scan_events_dropped_total", {}, scan_recorder.dropped),
+        ("reellink_scan_events_write_failures_total", {}, scan_recorder.write_failures),
+        ("reellink_scan_events_rolled_up_total", {}, scan_recorder.rolled_up),
+        ("reellink_scan_events_queued", {}, scan_recorder.pending()),
+    ]
+
+register_collector("analytics", _collect)
@@ -0,0 +1,154 @@
+import json
+import re
+
+# --- Tolerant Answer Parsing ---
+# Standard library only. The answer is parsed chunk by chunk in the thread that
+# reads the Gemini stream (src.extractor._stream_answer), so it never runs on
+# the event loop; a process pool can't consume the stream, so it isn't used here.
+
+# Inside a JSON string only quotes and backslashes matter; outside one, only
+# the structural characters do. Jumping between them with a regex keeps the
+# scan in C even for a long extracted_content.
+_STRING_SPECIAL = re.compile(r'["\\]')
+_STRUCTURAL = re.compile(r'[{}\[\]",]')
+
+
+class StreamingAnswerParser:
+    """
+    Incrementally scans model output for the first JSON object, ignoring any
+    prose or ```json fences around it.
+
+    Top-level fields become available in `fields` as soon as each one is
+    complete, so the caller can act on tool_name/category while a long
+    extracted_content is still streaming. Each feed() only scans the new text.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.fields = {}
+        self.data = None
+        self.complete = False
+        self._pos = 0
+        self._start = None  # index of the object's opening brace
+        self._depth = 0
+        self._in_string = False
+        self._pair_start = None  # start of the current top-level "key": value
+
+    def feed(self, chunk: str):
+        if not chunk:
+            return
+        self.text += chunk
+        if self.complete:
+            return
+        text = self.text
+        i = self._pos
+        while True:
+            if self._start is None:
+                i = text.find("{", i)
+                if i < 0:
+                    i = len(text)
+                    break
+                self._start, self._depth, self._pair_start = i, 1, i + 1
+                i += 1
+                continue
+            if self._in_string:
+                match = _STRING_SPECIAL.search(text, i)
+                if match is None:
+                    i = len(text)
+                    break
+                i = match.end()
+                if match.group() == "\\":
+                    if i >= len(text):
+                        i -= 1  # the escaped character hasn't arrived yet
+                        break
+                    i += 1
+                else:
+                    self._in_string = False
+                continue
+            match = _STRUCTURAL.search(text, i)
+            if match is None:
+                i = len(text)
+                break
+            char, i = match.group(), match.end()
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._close_pair(i - 1)
+                    if self._finish(i):
+                        break
+                    # Not an answer (a brace in prose); look for the next object.
+                    i = self._start + 1
+                    self._start = None
+                    self.fields = {}
+            elif char == "," and self._depth == 1:
+                self._close_pair(i - 1)
+                self._pair_start = i
+        self._pos = i
+
+    def _close_pair(self, end: int):
+        segment = self.text[self._pair_start:end].strip()
+        if not segment:
+            return
+        try:
+            self.fields.update(json.loads("{" + segment + "}"))
+        except ValueError:
+            pass  # a malformed field doesn't spoil the others
+
+    def _finish(self, end: int) -> bool:
+        try:
+            data = json.loads(self.text[self._start:end])
+        except ValueError:
+            data = dict(self.fields) if self.fields else None
+        if not isinstance(data, dict) or "tool_name" not in data:
+            return False
+        self.data = data
+        self.complete = True
+        return True
+
+    @property
+    def ready(self) -> bool:
+        """True once the answer is usable: the object is closed, or tool_name and
+        category are in (plus extracted_content, which resources need)."""
+        if self.complete:
+            return True
+        fields = self.fields
+        if "tool_name" in fields and "category" in fields:
+            return fields["category"] != "resource" or "extracted_content" in fields
+        return False
+
+    def result(self):
+        """The parsed answer so far (possibly just the completed fields), or None."""
+        if self.complete:
+            return self.data
+        if "tool_name" in self.fields:
+            return dict(self.fields)
+        return None
+
+
+def parse_answer(text: str):
+    """
+    Tolerantly parses a complete (or truncated) model answer.
+    Returns (data, None) on success or (None, error_message) on failure.
+    """
+    parser = StreamingAnswerParser()
+    parser.feed(text)
+    data = parser.result()
+    if data is None:
+        return None, "no JSON object with a tool_name in the response"
+    return data, None
+
+
+def parse_strict(text: str):
+    """
+    The parser used before structured output: strip ```json fences and
+    json.loads the rest. Kept to measure how often it would have failed.
+    """
+    cleaned_text = text.strip().replace('```json', '').replace('```', '').strip()
+    try:
+        return json.loads(cleaned_text), None
+    except json.JSONDecodeError as e:
+        return None, str(e)
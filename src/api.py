@@ -3,6 +3,7 @@ import sys # Add this line
 import json
 import asyncio
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from concurrent.futures import ThreadPoolExecutor
 
 # === START COOKIE SETUP ===
@@ -35,17 +36,27 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
 # =======================
 
-from src.bot import main as bot_main
-
 app = FastAPI()
 executor = ThreadPoolExecutor(max_workers=1)
 
+def run_bot():
+    # Imported here so telegram/SQLAlchemy load on the executor thread and the
+    # health check can answer while the bot is still starting.
+    from src.bot import main as bot_main
+    bot_main()
+
 @app.on_event("startup")
 async def startup_event():
     print("🚀 Starting Bot as a background Executor task...")
     loop = asyncio.get_running_loop()
-    loop.run_in_executor(executor, bot_main)
+    loop.run_in_executor(executor, run_bot)
 
 @app.get("/")
 def health_check():
-    return {"status": "active", "service": "ReelLink Sniper API wrapper"}
\ No newline at end of file
+    return {"status": "active", "service": "ReelLink Sniper API wrapper"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Circuit breaker state and other runtime counters, in Prometheus text format.
+    from src.metrics import render_prometheus
+    return render_prometheus()
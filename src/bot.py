@@ -10,23 +10,27 @@ from telegram.ext import (
 )
 from telegram.ext import AIORateLimiter
 import asyncio
-import re
 import time # Import time for potential sleep if needed in post_init, though async delays are preferred
 from .config import TELEGRAM_BOT_TOKEN
-from .processor import process_reel
-from .database import get_or_create_user
-
-# Set up logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    handlers=[
-        logging.FileHandler("app.log"),
-        logging.StreamHandler() # Also log to console for visibility if not run in background
-    ]
-)
+from .processor import process_reel, preload_search_client
+from .extractor import get_genai
+from .media_buffers import media_buffers
+from .logging_setup import configure_logging
+from .loop_monitor import loop_monitor
+from .warmer import cache_warmer, trend_tracker
+from .database import get_or_create_user, init_db
+from .links import ingest_links
+from .result_cache import result_cache
+from .analytics import scan_recorder
+
+# Set up logging (JSON lines to app.log and text to the console, written by a
+# background thread so handlers never block the event loop)
+configure_logging()
 logger = logging.getLogger(__name__)
 
+# Most reel links scanned per message; cached results don't count.
+MAX_LINKS_PER_MESSAGE = 10
+
 # --- Per-User Rate Limiting ---
 # Allows 5 requests per user every 60 seconds.
 user_rate_limiter = AIORateLimiter(overall_max_rate=5, overall_time_period=60)
@@ -43,7 +47,7 @@ async def rate_limit_exceeded(update: Update, context: ContextTypes.DEFAULT_TYPE
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Sends a message when the command /start is issued."""
     user = update.effective_user
-    get_or_create_user(user.id, user.username)
+    await asyncio.to_thread(get_or_create_user, user.id, user.username)
     logger.info(f"User {user.id} started the bot.")
     await update.message.reply_html(
         f"Hi {user.mention_html()}! Send me Instagram/TikTok/YouTube Reel links and I'll find the hidden tools for you.",
@@ -68,11 +72,12 @@ async def privacy_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         "I am designed with your privacy in mind. Here’s what you need to know:\n\n"
         "**What I Store:**\n"
         "- `User ID`: Your numeric Telegram ID is stored to recognize you as a user.\n"
-        "- `Username`: Your Telegram username is stored for the same reason.\n\n"
+        "- `Username`: Your Telegram username is stored for the same reason.\n"
+        "- `Usage stats`: For each scan, the platform (e.g. TikTok), how long it took and whether a tool was found. This is used for usage limits and capacity planning, and never includes the link itself.\n\n"
         "**What I DO NOT Store:**\n"
-        "- I **do not** store the links to the reels you send me.\n"
+        "- I **do not** store the links to the reels you send me in any database or alongside your ID.\n"
         "- I **do not** store the videos downloaded for analysis. They are deleted from memory immediately after being processed.\n"
-        "- I **do not** store any information extracted from the videos.\n\n"
+        "- I **do not** store any information extracted from the videos in a database. Results for popular reels are kept in memory for a few hours, not linked to you, so repeat requests answer instantly.\n\n"
         "Your data is only used to process your requests and is never shared. My purpose is to find links, not to collect your data."
     )
     await update.message.reply_text(
@@ -88,12 +93,11 @@ async def handle_reel_links(update: Update, context: ContextTypes.DEFAULT_TYPE)
     user = update.effective_user
     
     # Register user or update last activity
-    get_or_create_user(user.id, user.username)
+    await asyncio.to_thread(get_or_create_user, user.id, user.username)
     logger.info(f"User {user.id} sent message: {text}")
 
-    # Regex to find common video reel links
-    # This regex is basic and might need refinement for all cases.
-    reel_links = re.findall(r'(https?://(?:www\.)?(?:instagram\.com|tiktok\.com|youtube\.com|youtu\.be)/(?:reel|shorts|video)/[a-zA-Z0-9_-]+(?:/?(?:c|\?|&)[^ \n]*)?)', text)
+    # Find, expand (short links) and dedupe the links in the message
+    reel_links = await ingest_links(text)
     
     if not reel_links:
         logger.info(f"No valid reel links found in message from user {user.id}.")
@@ -103,21 +107,32 @@ async def handle_reel_links(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
         return
 
-    # Limit processing to a reasonable number if many links are sent
-    if len(reel_links) > 10:
-        logger.warning(f"User {user.id} sent {len(reel_links)} links, processing only first 10.")
+    # Limit processing to a reasonable number if many links are sent. Links we
+    # already have a cached answer for are instant, so they don't count.
+    selected_links = []
+    new_links = 0
+    for link in reel_links:
+        if link.canonical_id in result_cache:
+            selected_links.append(link)
+        elif new_links < MAX_LINKS_PER_MESSAGE:
+            selected_links.append(link)
+            new_links += 1
+    skipped = len(reel_links) - len(selected_links)
+    if skipped:
+        logger.warning(f"User {user.id} sent {len(reel_links)} links, skipping {skipped} over the limit.")
         await update.message.reply_text(
-            f"You sent {len(reel_links)} links. I will process the first 10 for now. Please send fewer links next time for faster processing.",
+            f"You sent {len(reel_links)} links. I will process the first {MAX_LINKS_PER_MESSAGE} new ones for now. Please send fewer links next time for faster processing.",
             reply_to_message_id=update.message.message_id
         )
-        reel_links = reel_links[:10]
+    reel_links = selected_links
 
     # Process each reel link
     for i, link in enumerate(reel_links):
-        logger.info(f"Processing reel {i+1}/{len(reel_links)} for user {user.id}: {link}")
+        trend_tracker.record_request(link.url)
+        logger.info(f"Processing reel {i+1}/{len(reel_links)} for user {user.id}: {link.url}")
         # Instantly reply "Scanning..." and quote the exact reel message
         status_message = await update.message.reply_text(
-            f"Scanning Reel {i+1}/{len(reel_links)}: ⏳\n`{link}`",
+            f"Scanning Reel {i+1}/{len(reel_links)}: ⏳\n`{link.original}`",
             reply_to_message_id=update.message.message_id,
             parse_mode="Markdown"
         )
@@ -128,20 +143,26 @@ async def handle_reel_links(update: Update, context: ContextTypes.DEFAULT_TYPE)
             send_processed_reel_result(
                 context, 
                 chat_id=update.effective_chat.id, 
+                user_id=user.id,
                 reply_to_message_id=status_message.message_id, # Reply to the "Scanning..." message
-                original_reel_url=link,
+                original_reel_url=link.url,
                 reel_index=i+1,
                 total_reels=len(reel_links)
             )
         )
 
-async def send_processed_reel_result(context: ContextTypes.DEFAULT_TYPE, chat_id: int, reply_to_message_id: int, original_reel_url: str, reel_index: int, total_reels: int) -> None:
+async def send_processed_reel_result(context: ContextTypes.DEFAULT_TYPE, chat_id: int, user_id: int, reply_to_message_id: int, original_reel_url: str, reel_index: int, total_reels: int) -> None:
     """
     Sends the result of a processed reel back to the user by editing the 'Scanning...' message.
     The processor now returns a fully-formed message for the user.
     """
+    # Any user job pre-empts background cache warming.
+    cache_warmer.user_job_started()
     try:
         result = await process_reel(original_reel_url)
+        trend_tracker.record_account(original_reel_url, result.get("uploader"))
+        # Queued only; written in batches by the analytics thread.
+        scan_recorder.record(user_id, original_reel_url, result)
         
         # The 'processor' now formats the entire message, including errors.
         final_message = result.get("final_message", "An unexpected error occurred.")
@@ -166,6 +187,7 @@ async def send_processed_reel_result(context: ContextTypes.DEFAULT_TYPE, chat_id
 
     except Exception as e:
         logger.exception(f"Critical error in send_processed_reel_result for {original_reel_url}: {e}")
+        scan_recorder.record(user_id, original_reel_url, None, outcome="crash")
         # This is a fallback for unexpected errors in the processing pipeline itself
         await context.bot.edit_message_text(
             chat_id=chat_id,
@@ -173,12 +195,44 @@ async def send_processed_reel_result(context: ContextTypes.DEFAULT_TYPE, chat_id
             text=f"Reel {reel_index}/{total_reels} failed due to a critical internal error. The team has been notified. Please try again later.",
             parse_mode="Markdown"
         )
+    finally:
+        cache_warmer.user_job_finished()
+
+def warm_up_clients() -> None:
+    """
+    Creates the database, configures the Gemini client and imports the Custom
+    Search client library.
+    Runs in a worker thread after polling starts so the first reel doesn't pay for it.
+    """
+    started = time.perf_counter()
+    steps = [
+        ("database", init_db),
+        ("Gemini client", get_genai),
+        ("Custom Search import", preload_search_client),
+    ]
+    for name, step in steps:
+        try:
+            step()
+        except Exception as e:
+            # Every client is also created lazily on first use, so this is not fatal,
+            # and one failing step doesn't skip the others.
+            logger.warning(f"Background warm-up step '{name}' failed: {e}")
+    logger.info(f"Background warm-up finished in {time.perf_counter() - started:.2f}s.")
 
 async def post_init(application: Application) -> None:
     """
     Called after the Application is built.
-    Ensures a clean Telegram API state by deleting webhooks before polling starts.
+    Ensures a clean Telegram API state by deleting webhooks before polling starts,
+    and kicks off the client warm-up in the background.
     """
+    # Before polling starts, on the loop: the sweep must not race acquire()
+    # (it would delete a live download's buffer). It's only a directory listing.
+    media_buffers.sweep_orphans()
+    application.create_task(asyncio.to_thread(warm_up_clients))
+    application.create_task(loop_monitor.run())
+    application.create_task(cache_warmer.run())
+    scan_recorder.start()
+
     logger.info("Running post_init: Deleting old webhooks to clear conflicts.")
     try:
         # Delete any pending webhooks
@@ -186,18 +240,12 @@ async def post_init(application: Application) -> None:
         logger.info("Old webhooks deleted in post_init.")
     except Exception as e:
         logger.warning(f"Error while trying to delete webhook in post_init: {e}")
-    
-    # Small delay to let Telegram API process changes
-    await asyncio.sleep(1)
+
     logger.info("post_init complete. Ready to start polling.")
 
 
-def main() -> None:
-    """Start the bot."""
-    if not TELEGRAM_BOT_TOKEN:
-        logger.error("Error: TELEGRAM_BOT_TOKEN not found in environment variables. Please set it in your .env file.")
-        return
-
+def build_application() -> Application:
+    """Builds the Application and registers all handlers, without starting it."""
     # Build the application with the post_init hook and rate limiter
     application = (
         Application.builder()
@@ -216,7 +264,16 @@ def main() -> None:
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_reel_links))
     # Add a handler for messages that *are* rate-limited
     application.add_handler(TypeHandler(Update, rate_limit_exceeded))
+    return application
+
+
+def main() -> None:
+    """Start the bot."""
+    if not TELEGRAM_BOT_TOKEN:
+        logger.error("Error: TELEGRAM_BOT_TOKEN not found in environment variables. Please set it in your .env file.")
+        return
 
+    application = build_application()
 
     # Run the bot until the user presses Ctrl-C
     logger.info("Bot started. Press Ctrl-C to stop.")
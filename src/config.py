@@ -20,3 +20,109 @@ if not TELEGRAM_BOT_TOKEN or TELEGRAM_BOT_TOKEN == "your_telegram_bot_token_here
 
 # --- Non-Secret Configuration ---
 DATABASE_URL = "sqlite:///reel_link_sniper.db"
+
+# --- Resilience (circuit breakers, retries, hedging) ---
+# A dependency's breaker opens after this many consecutive failures and stays
+# open (failing fast) for BREAKER_RESET_SECONDS before a single trial call.
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "60"))
+# Transient errors are retried with jittered exponential backoff.
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "1.0"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "10.0"))
+# Start a second yt-dlp resolution if the first hasn't answered after this many
+# seconds; whichever finishes first wins. Set to 0 to disable hedging.
+YTDLP_HEDGE_DELAY = float(os.getenv("YTDLP_HEDGE_DELAY", "8"))
+YTDLP_TIMEOUT = float(os.getenv("YTDLP_TIMEOUT", "45"))
+DOWNLOAD_TIMEOUT = float(os.getenv("DOWNLOAD_TIMEOUT", "60"))
+GEMINI_REQUEST_TIMEOUT = float(os.getenv("GEMINI_REQUEST_TIMEOUT", "600"))
+
+# --- Media Buffers (downloaded videos) ---
+# Total bytes all in-flight downloads may hold at once; new downloads wait.
+MEDIA_BUFFER_BUDGET_BYTES = int(os.getenv("MEDIA_BUFFER_BUDGET_BYTES", str(512 * 1024 * 1024)))
+# Reservation for downloads whose size isn't known up front (no Content-Length).
+MEDIA_DEFAULT_RESERVATION_BYTES = int(os.getenv("MEDIA_DEFAULT_RESERVATION_BYTES", str(40 * 1024 * 1024)))
+# Memory-backed (tmpfs) directory, used while enough RAM is free; set empty to disable.
+MEDIA_MEMORY_DIR = os.getenv("MEDIA_MEMORY_DIR", "/dev/shm")
+# Never let tmpfs buffers take more than this fraction of currently available RAM.
+MEDIA_MEMORY_MAX_FRACTION = float(os.getenv("MEDIA_MEMORY_MAX_FRACTION", "0.25"))
+
+# --- Logging ---
+LOG_FILE = os.getenv("LOG_FILE", "app.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# app.log is rotated by size: LOG_BACKUP_COUNT files of LOG_MAX_BYTES each are kept.
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# Longer messages (message texts, raw Gemini responses, tool_data dicts) are truncated.
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "1000"))
+# Per-logger sampling for DEBUG/INFO records, e.g. "src.extractor=0.2,src.bot=0.5".
+# Loggers match by prefix; WARNING and above are never sampled out.
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+
+# --- Result Cache & Trending Warmer ---
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", str(6 * 3600)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "2000"))
+WARMER_ENABLED = os.getenv("WARMER_ENABLED", "1") == "1"
+# Local hours (start-end, may wrap midnight) in which spare quota is spent on warming.
+# Empty means any hour, as long as no user jobs are running.
+WARMER_OFFPEAK_HOURS = os.getenv("WARMER_OFFPEAK_HOURS", "1-7")
+WARMER_MAX_JOBS_PER_HOUR = int(os.getenv("WARMER_MAX_JOBS_PER_HOUR", "20"))
+WARMER_INTERVAL_SECONDS = float(os.getenv("WARMER_INTERVAL_SECONDS", "30"))
+# A reel is worth warming once its decayed request count (plus its account's boost) reaches this.
+WARMER_MIN_SCORE = float(os.getenv("WARMER_MIN_SCORE", "3"))
+# Counts halve every WARMER_HALF_LIFE_SECONDS, so "trending" means "trending recently".
+WARMER_HALF_LIFE_SECONDS = float(os.getenv("WARMER_HALF_LIFE_SECONDS", "3600"))
+# Cached results are refreshed when they expire within this window.
+WARMER_REFRESH_BEFORE_SECONDS = float(os.getenv("WARMER_REFRESH_BEFORE_SECONDS", "1800"))
+# A warm-up that left no cached result (N/A, error) isn't retried for the same reel within this window.
+WARMER_RETRY_SECONDS = float(os.getenv("WARMER_RETRY_SECONDS", "3600"))
+
+# --- Process Pool (CPU-bound work off the event loop) ---
+# Worker processes for hashing, parsing and other CPU-heavy tasks. 0 runs them
+# in a thread instead (still off the loop, but sharing the GIL).
+WORKER_POOL_SIZE = int(os.getenv("WORKER_POOL_SIZE", str(min(2, os.cpu_count() or 1))))
+WORKER_TASK_TIMEOUT = float(os.getenv("WORKER_TASK_TIMEOUT", "30"))
+# Workers are replaced after this many tasks, to cap leaks in native libraries.
+WORKER_MAX_TASKS_PER_CHILD = int(os.getenv("WORKER_MAX_TASKS_PER_CHILD", "200"))
+
+# --- Streaming Upload ---
+# Pipe downloaded chunks straight into a Gemini resumable upload session while
+# the download is still running (the file on disk is kept only as a fallback).
+GEMINI_STREAMING_UPLOAD = os.getenv("GEMINI_STREAMING_UPLOAD", "1") == "1"
+# Bytes per upload request; rounded down to the server's chunk granularity (256 KiB).
+GEMINI_UPLOAD_CHUNK_BYTES = int(os.getenv("GEMINI_UPLOAD_CHUNK_BYTES", str(8 * 1024 * 1024)))
+# Downloaded chunks waiting for the uploader; caps memory at roughly this many
+# network reads on top of one upload chunk.
+GEMINI_UPLOAD_QUEUE_CHUNKS = int(os.getenv("GEMINI_UPLOAD_QUEUE_CHUNKS", "64"))
+
+# --- Model Routing ---
+# Gemini models from cheapest/fastest to strongest. Short or caption-rich reels
+# start low and escalate on an N/A or unparsable answer; others use the last one.
+GEMINI_MODEL_TIERS = [m.strip() for m in os.getenv("GEMINI_MODEL_TIERS", "models/gemini-2.5-flash-lite,models/gemini-2.5-flash").split(",") if m.strip()]
+# Requests per minute each model may use, e.g. "models/gemini-2.5-flash=10".
+# Models not listed get GEMINI_DEFAULT_RPM.
+GEMINI_MODEL_RPM = os.getenv("GEMINI_MODEL_RPM", "models/gemini-2.5-flash-lite=15,models/gemini-2.5-flash=10")
+GEMINI_DEFAULT_RPM = float(os.getenv("GEMINI_DEFAULT_RPM", "10"))
+# Concurrent inference requests per model.
+GEMINI_MODEL_CONCURRENCY = int(os.getenv("GEMINI_MODEL_CONCURRENCY", "2"))
+# A reel counts as "light" if it is at most this long, or its caption is at least this long.
+ROUTER_SHORT_VIDEO_SECONDS = float(os.getenv("ROUTER_SHORT_VIDEO_SECONDS", "30"))
+ROUTER_CAPTION_RICH_CHARS = int(os.getenv("ROUTER_CAPTION_RICH_CHARS", "150"))
+# Weight of the newest sample in the per-model latency/error/success averages.
+ROUTER_EWMA_ALPHA = float(os.getenv("ROUTER_EWMA_ALPHA", "0.1"))
+# Every Nth light reel starts on the cheapest model even if its stats say skip it.
+ROUTER_PROBE_EVERY = int(os.getenv("ROUTER_PROBE_EVERY", "20"))
+# Share of each model's RPM budget background work (the cache warmer) must leave for users.
+ROUTER_USER_RESERVE_FRACTION = float(os.getenv("ROUTER_USER_RESERVE_FRACTION", "0.5"))
+
+# --- Scan Analytics ---
+# Scan events are queued on the hot path and written in batches by a background thread.
+ANALYTICS_ENABLED = os.getenv("ANALYTICS_ENABLED", "1") == "1"
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "200"))
+ANALYTICS_FLUSH_SECONDS = float(os.getenv("ANALYTICS_FLUSH_SECONDS", "5"))
+# Events waiting to be written; beyond this new events are dropped (and counted).
+ANALYTICS_QUEUE_MAX = int(os.getenv("ANALYTICS_QUEUE_MAX", "10000"))
+# How often new events are folded into the hourly tables and User.scan_count.
+ANALYTICS_ROLLUP_SECONDS = float(os.getenv("ANALYTICS_ROLLUP_SECONDS", "60"))
+# Raw events are deleted this long after they have been rolled up.
+ANALYTICS_RAW_RETENTION_DAYS = float(os.getenv("ANALYTICS_RAW_RETENTION_DAYS", "30"))
@@ -0,0 +1,15 @@
+import hashlib
+
+# --- CPU-Bound Tasks ---
+# Functions here run inside the worker processes of src.workers, so they must
+# be top-level (picklable) and import nothing beyond the standard library:
+# every worker re-imports this module on start.
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Returns the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
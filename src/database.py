@@ -1,7 +1,8 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, UniqueConstraint, func
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
+import threading
 from .config import DATABASE_URL
 
 Base = declarative_base()
@@ -19,13 +20,83 @@ class User(Base):
     def __repr__(self):
         return f"<User(telegram_id={self.telegram_id}, username='{self.username}', scan_count={self.scan_count})>"
 
+# --- Scan Analytics ---
+# scan_events is an append-only log written in batches by src.analytics. A
+# rollup folds new events into the hourly tables (and User.scan_count), which
+# quota checks and dashboards read instead of the raw rows. Events never hold
+# the reel link itself (see the privacy policy in src.bot).
+class ScanEvent(Base):
+    __tablename__ = 'scan_events'
+    # Ids must never be reused: the rollup watermark is an id. Without
+    # AUTOINCREMENT, SQLite hands out old rowids again once pruning empties the table.
+    __table_args__ = {'sqlite_autoincrement': True}
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, nullable=False, index=True)
+    telegram_id = Column(Integer, nullable=False, index=True)
+    platform = Column(String, nullable=False)
+    outcome = Column(String, nullable=False)  # found / not_found / error / crash
+    cache_hit = Column(Boolean, default=False)
+    # Stage latencies in milliseconds (null when the stage didn't run)
+    resolve_ms = Column(Integer)
+    download_ms = Column(Integer)
+    upload_ms = Column(Integer)
+    processing_ms = Column(Integer)
+    inference_ms = Column(Integer)
+    total_ms = Column(Integer)
+
+class UserUsageHourly(Base):
+    __tablename__ = 'user_usage_hourly'
+    __table_args__ = (UniqueConstraint('hour', 'telegram_id', 'platform'),)
+    id = Column(Integer, primary_key=True)
+    hour = Column(DateTime, nullable=False, index=True)
+    telegram_id = Column(Integer, nullable=False, index=True)
+    platform = Column(String, nullable=False)
+    scans = Column(Integer, default=0)
+    cache_hits = Column(Integer, default=0)
+    failures = Column(Integer, default=0)
+
+class PlatformUsageHourly(Base):
+    __tablename__ = 'platform_usage_hourly'
+    __table_args__ = (UniqueConstraint('hour', 'platform', 'outcome'),)
+    id = Column(Integer, primary_key=True)
+    hour = Column(DateTime, nullable=False, index=True)
+    platform = Column(String, nullable=False)
+    outcome = Column(String, nullable=False)
+    scans = Column(Integer, default=0)
+    cache_hits = Column(Integer, default=0)
+    total_ms = Column(Integer, default=0)
+    inference_ms = Column(Integer, default=0)
+
+class RollupState(Base):
+    """How far each rollup has read its source log (the last event id folded in)."""
+    __tablename__ = 'rollup_state'
+    name = Column(String, primary_key=True)
+    last_event_id = Column(Integer, default=0)
+
 # Add other models as needed, e.g., for affiliate programs, detected tools
 
-engine = create_engine(DATABASE_URL)
-Base.metadata.create_all(engine)
-Session = sessionmaker(bind=engine)
+# --- Lazy Engine ---
+# Creating the engine and running create_all touches the database file, so it is
+# deferred until init_db() is called (in the background at startup) or until the
+# first query, whichever comes first.
+engine = None
+Session = sessionmaker()
+_init_lock = threading.Lock()
+
+def init_db():
+    """Creates the engine and tables once. Safe to call from any thread."""
+    global engine
+    if engine is None:
+        with _init_lock:
+            if engine is None:
+                new_engine = create_engine(DATABASE_URL)
+                Base.metadata.create_all(new_engine)
+                Session.configure(bind=new_engine)
+                engine = new_engine
+    return engine
 
 def get_or_create_user(telegram_id, username=None):
+    init_db()
     session = Session()
     user = session.query(User).filter_by(telegram_id=telegram_id).first()
     if not user:
@@ -35,4 +106,157 @@ def get_or_create_user(telegram_id, username=None):
     session.close()
     return user
 
-# Add functions for updating scan counts, checking limits, etc.
+# --- Scan Analytics Writes (called from the analytics writer thread only) ---
+def insert_scan_events(rows):
+    """Appends a batch of scan events (dicts of ScanEvent columns) in one transaction."""
+    init_db()
+    session = Session()
+    try:
+        session.bulk_insert_mappings(ScanEvent, rows)
+        session.commit()
+    finally:
+        session.close()
+
+def _hour(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+def rollup_scan_events(limit=500):
+    """
+    Folds scan events newer than the rollup watermark into the hourly tables and
+    User.scan_count / last_scanned, all in one transaction. Returns how many
+    events were rolled up (call again while it returns `limit`).
+    Assumes a single writer, so read-modify-write of the counters is safe.
+    """
+    init_db()
+    session = Session()
+    try:
+        state = session.query(RollupState).filter_by(name='scan_events').first()
+        if state is None:
+            state = RollupState(name='scan_events', last_event_id=0)
+            session.add(state)
+        events = (session.query(ScanEvent)
+                  .filter(ScanEvent.id > state.last_event_id)
+                  .order_by(ScanEvent.id)
+                  .limit(limit)
+                  .all())
+        if not events:
+            session.commit()
+            return 0
+
+        user_hours = {}  # (hour, telegram_id, platform) -> [scans, cache_hits, failures]
+        platform_hours = {}  # (hour, platform, outcome) -> [scans, cache_hits, total_ms, inference_ms]
+        users = {}  # telegram_id -> [scans, last_scanned]
+        for event in events:
+            hour = _hour(event.created_at)
+            counts = user_hours.setdefault((hour, event.telegram_id, event.platform), [0, 0, 0])
+            counts[0] += 1
+            counts[1] += int(bool(event.cache_hit))
+            counts[2] += int(event.outcome in ('error', 'crash'))
+            counts = platform_hours.setdefault((hour, event.platform, event.outcome), [0, 0, 0, 0])
+            counts[0] += 1
+            counts[1] += int(bool(event.cache_hit))
+            counts[2] += event.total_ms or 0
+            counts[3] += event.inference_ms or 0
+            user = users.setdefault(event.telegram_id, [0, event.created_at])
+            user[0] += 1
+            user[1] = max(user[1], event.created_at)
+
+        hours = {key[0] for key in user_hours}
+        existing = {(row.hour, row.telegram_id, row.platform): row
+                    for row in session.query(UserUsageHourly).filter(UserUsageHourly.hour.in_(hours))}
+        for key, (scans, cache_hits, failures) in user_hours.items():
+            row = existing.get(key)
+            if row is None:
+                row = UserUsageHourly(hour=key[0], telegram_id=key[1], platform=key[2], scans=0, cache_hits=0, failures=0)
+                session.add(row)
+            row.scans += scans
+            row.cache_hits += cache_hits
+            row.failures += failures
+
+        existing = {(row.hour, row.platform, row.outcome): row
+                    for row in session.query(PlatformUsageHourly).filter(PlatformUsageHourly.hour.in_(hours))}
+        for key, (scans, cache_hits, total_ms, inference_ms) in platform_hours.items():
+            row = existing.get(key)
+            if row is None:
+                row = PlatformUsageHourly(hour=key[0], platform=key[1], outcome=key[2], scans=0, cache_hits=0, total_ms=0, inference_ms=0)
+                session.add(row)
+            row.scans += scans
+            row.cache_hits += cache_hits
+            row.total_ms += total_ms
+            row.inference_ms += inference_ms
+
+        for telegram_id, (scans, last_scanned) in users.items():
+            session.query(User).filter_by(telegram_id=telegram_id).update(
+                {User.scan_count: func.coalesce(User.scan_count, 0) + scans, User.last_scanned: last_scanned},
+                synchronize_session=False,
+            )
+
+        state.last_event_id = events[-1].id
+        session.commit()
+        return len(events)
+    finally:
+        session.close()
+
+def prune_scan_events(before):
+    """
+    Deletes raw events older than `before` that have already been rolled up.
+    The event at the watermark is kept, so even a table created before
+    AUTOINCREMENT never hands out an id at or below the watermark again.
+    """
+    init_db()
+    session = Session()
+    try:
+        state = session.query(RollupState).filter_by(name='scan_events').first()
+        if state is None:
+            return 0
+        deleted = (session.query(ScanEvent)
+                   .filter(ScanEvent.id < state.last_event_id, ScanEvent.created_at < before)
+                   .delete(synchronize_session=False))
+        session.commit()
+        return deleted
+    finally:
+        session.close()
+
+# --- Usage Reads (precomputed counters) ---
+def count_user_scans(telegram_id, since):
+    """
+    Scans by a user since `since` (rounded down to the hour), for quota checks.
+    Reads the hourly table plus the few events not yet rolled up.
+    """
+    init_db()
+    session = Session()
+    try:
+        rolled = (session.query(func.coalesce(func.sum(UserUsageHourly.scans), 0))
+                  .filter(UserUsageHourly.telegram_id == telegram_id, UserUsageHourly.hour >= _hour(since))
+                  .scalar())
+        state = session.query(RollupState).filter_by(name='scan_events').first()
+        pending = (session.query(func.count(ScanEvent.id))
+                   .filter(ScanEvent.id > (state.last_event_id if state else 0), ScanEvent.telegram_id == telegram_id)
+                   .scalar())
+        return int(rolled) + int(pending)
+    finally:
+        session.close()
+
+def platform_usage(since):
+    """Per-hour, per-platform, per-outcome counters since `since`, for dashboards and capacity planning."""
+    init_db()
+    session = Session()
+    try:
+        rows = (session.query(PlatformUsageHourly)
+                .filter(PlatformUsageHourly.hour >= _hour(since))
+                .order_by(PlatformUsageHourly.hour)
+                .all())
+        return [
+            {
+                "hour": row.hour,
+                "platform": row.platform,
+                "outcome": row.outcome,
+                "scans": row.scans,
+                "cache_hits": row.cache_hits,
+                "avg_total_ms": row.total_ms / row.scans if row.scans else 0,
+                "avg_inference_ms": row.inference_ms / row.scans if row.scans else 0,
+            }
+            for row in rows
+        ]
+    finally:
+        session.close()
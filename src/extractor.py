@@ -1,27 +1,51 @@
-import json
 import asyncio
-import google.generativeai as genai
+import functools
 import time
 import os
 import logging
-from .config import GEMINI_API_KEY
-from google.api_core import exceptions as google_exceptions
+import threading
+from .config import GEMINI_API_KEY, GEMINI_REQUEST_TIMEOUT
+from .resilience import ServiceDegradedError, get_breaker, resilient_call
+from .answer_parser import StreamingAnswerParser, parse_strict
+from .metrics import register_collector
+from .model_router import ModelRateLimitedError, model_router
 
 # Set up logging for this module
 logger = logging.getLogger(__name__)
 
 # --- Rate Limiting ---
-# The Gemini API free tier allows 2 requests per minute.
-# A semaphore is used to ensure no more than 2 concurrent requests are made.
-GEMINI_API_SEMAPHORE = asyncio.Semaphore(2)
+# Inference requests are limited per model (concurrency and RPM budget) by
+# src.model_router; this breaker guards the Files API (upload/get/delete).
+gemini_breaker = get_breaker("gemini")
 
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-else:
-    logger.error("GEMINI_API_KEY not set in environment variables. AI functionalities will be limited.")
+# --- Lazy Gemini Client ---
+# google.generativeai pulls in grpc and protobuf, which costs seconds on a cold
+# container. It is imported and configured on first use instead of at import time.
+_genai = None
+_genai_lock = threading.Lock()
 
-def construct_extraction_prompt():
-    return """
+def get_genai():
+    """
+    Returns the configured google.generativeai module, importing it on first use.
+    Safe to call from worker threads (e.g. a background warm-up).
+    """
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                if GEMINI_API_KEY:
+                    genai.configure(api_key=GEMINI_API_KEY)
+                else:
+                    logger.error("GEMINI_API_KEY not set in environment variables. AI functionalities will be limited.")
+                _genai = genai
+    return _genai
+
+# Longest caption passed to the model; the tool is named near the start if at all.
+MAX_PROMPT_CAPTION_CHARS = 2000
+
+def construct_extraction_prompt(caption: str = None):
+    prompt = """
     You are an expert investigator finding software tools in viral videos.
     
     Analyze the video visuals and audio to identify the PRIMARY tool or resource.
@@ -31,7 +55,7 @@ def construct_extraction_prompt():
     - "resource": If it promotes a template, prompt pack, or PDF (e.g. "ChatGPT Prompts").
     - "website": The default for SaaS tools/websites.
 
-    Return a raw JSON object with these fields (no markdown formatting):
+    Return a JSON object with these fields, in this order:
     {
       "tool_name": "Name of the tool",
       "category": "github_repo" | "mobile_app" | "resource" | "website",
@@ -40,16 +64,119 @@ def construct_extraction_prompt():
     
     If no tool is found, return: {"tool_name": "N/A", "category": "N/A", "extracted_content": null}
     """
+    if caption:
+        prompt += f"""
+    The creator's caption for this video (it often names the tool or says "comment X for the link"):
+    {caption[:MAX_PROMPT_CAPTION_CHARS]}
+    """
+    return prompt
+
+# --- Structured Output ---
+# The model must answer with JSON matching this schema. Fields are listed (and
+# requested in the prompt) with the long extracted_content last, so the
+# streaming parser usually has tool_name and category before it starts.
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "tool_name": {"type": "string"},
+        "category": {"type": "string", "enum": ["github_repo", "mobile_app", "resource", "website", "N/A"]},
+        "extracted_content": {"type": "string", "nullable": True},
+    },
+    "required": ["tool_name", "category"],
+}
+GENERATION_CONFIG = {"response_mime_type": "application/json", "response_schema": RESPONSE_SCHEMA}
+
+_answer_stats = {
+    "answers": 0,
+    "early_answers": 0,
+    "parse_failures": 0,
+    # Complete answers the old fence-stripping json.loads would have rejected.
+    "strict_parse_failures": 0,
+    "strict_checked": 0,
+    "answer_seconds": 0.0,
+}
+
+def _stream_answer(model, contents: list) -> dict:
+    """
+    Runs in a worker thread: streams the model's answer through the tolerant
+    parser and stops reading as soon as the answer is usable, instead of
+    waiting for the rest of a long extracted_content.
+    """
+    started = time.perf_counter()
+    parser = StreamingAnswerParser()
+    response = model.generate_content(
+        contents,
+        generation_config=GENERATION_CONFIG,
+        request_options={"timeout": GEMINI_REQUEST_TIMEOUT},
+        stream=True,
+    )
+    early = False
+    for chunk in response:
+        try:
+            piece = chunk.text
+        except ValueError:
+            continue  # a chunk with no text part, e.g. only a finish reason
+        parser.feed(piece)
+        if parser.ready and not parser.complete:
+            early = True
+            break
+    # Breaking out early drops the response, which cancels the rest of the
+    # stream. A complete object is read to the end (only trailing text is left),
+    # so the strict-parser comparison below sees the full answer.
+    answer = {
+        "text": parser.text,
+        "data": parser.result(),
+        "early": early,
+        "answer_s": time.perf_counter() - started,
+        "strict_ok": None,
+    }
+    if not answer["early"]:
+        answer["strict_ok"] = parse_strict(parser.text)[1] is None
+    return answer
 
-async def extract_tool_info_with_ai(video_path: str):
+def _record_answer(answer: dict):
+    _answer_stats["answers"] += 1
+    _answer_stats["answer_seconds"] += answer["answer_s"]
+    if answer["early"]:
+        _answer_stats["early_answers"] += 1
+    if answer["data"] is None:
+        _answer_stats["parse_failures"] += 1
+    if answer["strict_ok"] is not None:
+        _answer_stats["strict_checked"] += 1
+        if not answer["strict_ok"]:
+            _answer_stats["strict_parse_failures"] += 1
+
+async def extract_tool_info_with_ai(video_path: str, uploaded_file_name: str = None, timings: dict = None,
+                                    duration: float = None, caption: str = None, background: bool = False):
     """
     Uploads a video, waits for processing, and uses Gemini to extract structured tool information.
-    Uses a semaphore to rate-limit requests to the Gemini API and runs blocking I/O in threads.
+    The model is picked by src.model_router from the video's `duration` and
+    `caption`, escalating to a stronger model on an N/A or unparsable answer.
+    If the streaming path already uploaded the video, pass its `uploaded_file_name`
+    to skip the upload. Stage durations are added to `timings` when given.
+    `background` (cache warm-up) inference yields to user requests.
     """
+    timings = timings if timings is not None else {}
     if not GEMINI_API_KEY:
         return {"tool_name": "Error", "category": "Error", "extracted_content": "GEMINI_API_KEY not configured."}
 
-    model = genai.GenerativeModel(model_name="models/gemini-2.5-flash")
+    genai = await asyncio.to_thread(get_genai)
+    from google.api_core import exceptions as google_exceptions
+
+    # 429 / 500 / 503 are worth another try; everything else fails immediately.
+    transient_errors = (
+        google_exceptions.TooManyRequests,
+        google_exceptions.InternalServerError,
+        google_exceptions.ServiceUnavailable,
+    )
+    def is_transient(exc):
+        return isinstance(exc, transient_errors)
+
+    # Other 4xx errors (InvalidArgument for a bad video, NotFound, ...) are about
+    # this request, not Gemini's health, so they don't count against the breakers.
+    def counts_as_failure(exc):
+        return not isinstance(exc, google_exceptions.ClientError) or isinstance(exc, google_exceptions.TooManyRequests)
+
     video_file = None
     
     try:
@@ -58,53 +185,106 @@ async def extract_tool_info_with_ai(video_path: str):
             logger.warning(f"File size of {video_path} is too small! It's likely not a valid video.")
             return {"tool_name": "Error", "category": "Error", "extracted_content": "Downloaded video file is invalid (too small)."}
 
-        logger.info(f"Uploading file: {video_path}...")
-        video_file = await asyncio.to_thread(
-            genai.upload_file, path=video_path, display_name=os.path.basename(video_path)
-        )
-        logger.info(f"Completed upload. File name: {video_file.name}")
+        if uploaded_file_name:
+            # Uploaded while downloading (streaming path); just fetch its handle.
+            video_file = await resilient_call(
+                gemini_breaker, asyncio.to_thread, genai.get_file, name=uploaded_file_name,
+                retry_if=is_transient, counts_as_failure=counts_as_failure
+            )
+        else:
+            logger.info(f"Uploading file: {video_path}...")
+            upload_started = time.perf_counter()
+            video_file = await resilient_call(
+                gemini_breaker, asyncio.to_thread,
+                genai.upload_file, path=video_path, display_name=os.path.basename(video_path),
+                retry_if=is_transient, counts_as_failure=counts_as_failure
+            )
+            timings["upload_s"] = time.perf_counter() - upload_started
+            logger.info(f"Completed upload. File name: {video_file.name}")
 
+        processing_started = time.perf_counter()
         logger.info("Waiting for file to be processed...")
         while video_file.state.name == "PROCESSING":
             await asyncio.sleep(10)
-            video_file = await asyncio.to_thread(genai.get_file, name=video_file.name)
+            video_file = await resilient_call(
+                gemini_breaker, asyncio.to_thread, genai.get_file, name=video_file.name,
+                retry_if=is_transient, counts_as_failure=counts_as_failure
+            )
 
         if video_file.state.name == "FAILED":
             raise ValueError(f"Video processing failed: {video_file.state.name}")
 
+        timings["processing_s"] = time.perf_counter() - processing_started
         logger.info(f"File processing complete. State: {video_file.state.name}")
 
-        # --- Acquire Semaphore ---
-        logger.info(f"Waiting to acquire Gemini API semaphore for {video_path}...")
-        async with GEMINI_API_SEMAPHORE:
-            logger.info(f"Semaphore acquired for {video_path}. Making LLM inference request...")
-            
-            prompt = construct_extraction_prompt()
-            
-            # The actual rate-limited API call, run in a separate thread
-            response = await asyncio.to_thread(
-                model.generate_content,
-                [video_file, prompt], 
-                request_options={"timeout": 600}
-            )
-        # --- Release Semaphore ---
-        
-        logger.info(f"Raw Gemini Response Text: {response.text}")
+        prompt = construct_extraction_prompt(caption)
+        plan = model_router.plan(duration, caption)
+        logger.info(f"Model plan for {video_path} (duration={duration}, caption={len(caption or '')} chars): {plan}")
+        timings["inference_s"] = 0.0
+        degraded = None
+        tool_data, parse_error = None, None
+        for attempt, model_name in enumerate(plan):
+            last_attempt = attempt == len(plan) - 1
+            inference_started = time.perf_counter()
+            try:
+                answer = await model_router.generate(
+                    genai, model_name, functools.partial(_stream_answer, contents=[video_file, prompt]),
+                    retry_if=is_transient, counts_as_failure=counts_as_failure, background=background
+                )
+            except ServiceDegradedError as e:
+                logger.warning(f"Skipping {model_name}: {e}")
+                degraded = e
+                if isinstance(e, ModelRateLimitedError) and last_attempt:
+                    # Out of quota at the end of the plan: reroute to a tier with budget.
+                    alternative = model_router.fallback(plan)
+                    if alternative:
+                        logger.info(f"{model_name} is rate limited; rerouting to {alternative}.")
+                        plan.append(alternative)
+                continue
+            except google_exceptions.DeadlineExceeded:
+                raise
+            except Exception as e:
+                if not last_attempt:
+                    logger.warning(f"{model_name} failed for {video_path} ({e}); trying {plan[attempt + 1]}.")
+                    continue
+                if tool_data is None and parse_error is None:
+                    raise
+                # Keep the weaker model's N/A / unparsable answer.
+                logger.warning(f"{model_name} failed for {video_path} ({e}) after an escalation.")
+                break
+            finally:
+                timings["inference_s"] += time.perf_counter() - inference_started
 
-        cleaned_text = response.text.strip().replace('```json', '').replace('```', '').strip()
-        
-        try:
-            tool_data = json.loads(cleaned_text)
-            logger.info(f"Successfully parsed JSON: {tool_data}")
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to decode JSON from response: {cleaned_text} - Error: {e}")
-            return {"tool_name": "N/A", "category": "N/A", "extracted_content": f"JSON Parse Error: {e}"}
+            _record_answer(answer)
+            timings["answer_s"] = answer["answer_s"]
+            logger.info(f"Raw Gemini Response Text ({model_name}{', early' if answer['early'] else ''}): {answer['text']}")
+
+            tool_data = answer["data"]
+            parse_error = None if tool_data is not None else "no JSON object with a tool_name in the response"
+            useful = tool_data is not None and tool_data.get("tool_name") not in (None, "", "N/A")
+            model_router.record_outcome(model_name, useful, escalating=not useful and not last_attempt)
+            if useful:
+                tool_data["model"] = model_name
+                break
+            if not last_attempt:
+                logger.info(f"{model_name} gave no usable answer ({parse_error or 'N/A'}); escalating to {plan[attempt + 1]}.")
+
+        if tool_data is None and parse_error is None:
+            # Every model in the plan was skipped by its circuit breaker.
+            raise degraded or ServiceDegradedError("gemini", 60)
+        if parse_error:
+            logger.error(f"Failed to decode JSON from response: {answer['text']} - Error: {parse_error}")
+            return {"tool_name": "N/A", "category": "N/A", "extracted_content": f"JSON Parse Error: {parse_error}"}
+        logger.info(f"Successfully parsed JSON: {tool_data}")
 
         if not tool_data.get("tool_name") or tool_data["tool_name"] == "N/A":
             return {"tool_name": "N/A", "category": "N/A", "extracted_content": None}
             
         return tool_data
 
+    except ServiceDegradedError as e:
+        logger.warning(f"Skipping AI extraction for {video_path}: {e}")
+        return {"tool_name": "DEGRADED", "service": e.service, "retry_after": e.retry_after}
     except google_exceptions.DeadlineExceeded:
         logger.error(f"Gemini API call timed out for {video_path}.")
         return {"tool_name": "AI_TIMEOUT"}
@@ -113,9 +293,28 @@ async def extract_tool_info_with_ai(video_path: str):
         return {"tool_name": "Error", "category": "Error", "extracted_content": str(e)}
     
     finally:
-        if video_file:
-            try:
-                logger.info(f"Deleting uploaded file: {video_file.name}")
-                await asyncio.to_thread(genai.delete_file, name=video_file.name)
-            except Exception as e:
-                logger.error(f"Error deleting file {video_file.name}: {e}")
+        file_name = video_file.name if video_file else uploaded_file_name
+        if file_name:
+            logger.info(f"Deleting uploaded file: {file_name}")
+            await delete_uploaded_file(file_name)
+
+async def delete_uploaded_file(file_name: str):
+    """Deletes a Gemini file that turned out not to be needed (e.g. a content cache hit)."""
+    genai = await asyncio.to_thread(get_genai)
+    try:
+        await asyncio.to_thread(genai.delete_file, name=file_name)
+    except Exception as e:
+        logger.error(f"Error deleting file {file_name}: {e}")
+
+
+def _collect():
+    return [
+        ("reellink_gemini_answers_total", {}, _answer_stats["answers"]),
+        ("reellink_gemini_early_answers_total", {}, _answer_stats["early_answers"]),
+        ("reellink_gemini_parse_failures_total", {}, _answer_stats["parse_failures"]),
+        ("reellink_gemini_strict_parse_failures_total", {}, _answer_stats["strict_parse_failures"]),
+        ("reellink_gemini_strict_parse_checked_total", {}, _answer_stats["strict_checked"]),
+        ("reellink_gemini_time_to_answer_seconds_sum", {}, round(_answer_stats["answer_seconds"], 3)),
+    ]
+
+register_collector("extractor", _collect)
@@ -0,0 +1,260 @@
+import asyncio
+import collections
+import logging
+import re
+import time
+import httpx
+from .metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+# --- Link Matching ---
+# One precompiled scan finds supported hosts followed by a path; the hosts are
+# listed literally (most specific first) and matched case-sensitively so the
+# regex engine can skip quickly through ordinary chat text. Each hit is then
+# dispatched by host to that platform's own precompiled matcher, which
+# extracts the video ID.
+
+LINK_SCAN_PATTERN = (
+    r"(vm\.tiktok\.com|vt\.tiktok\.com|tiktok\.com|instagram\.com|instagr\.am|youtube\.com|youtu\.be)"
+    r"(/[^\s?#<>\"'`]*)(?:\?([^\s#<>\"'`]*))?"
+)
+LINK_SCAN_RE = re.compile(LINK_SCAN_PATTERN)
+# Much slower; only used for messages that spell a host in mixed case ("Instagram.com/...").
+LINK_SCAN_ANYCASE_RE = re.compile(LINK_SCAN_PATTERN, re.IGNORECASE)
+# Case-folded host fragments: more of them in text.lower() than in the text
+# itself means some host is written in mixed case.
+HOST_HINTS = ("tiktok.com", "instagr", "youtu")
+
+INSTAGRAM_RE = re.compile(r"/(?:[\w.]+/)?(?:reel|reels|p|tv)/([A-Za-z0-9_-]+)")
+INSTAGRAM_SHARE_RE = re.compile(r"/share/(?:reel/|p/)?[A-Za-z0-9_-]+")
+YOUTUBE_PATH_RE = re.compile(r"/(?:shorts|embed|live|v)/([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])")
+YOUTUBE_WATCH_QUERY_RE = re.compile(r"(?:^|&)v=([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])")
+YOUTU_BE_RE = re.compile(r"/([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])")
+TIKTOK_RE = re.compile(r"/@([\w.-]+)/(?:video|photo)/(\d+)")
+TIKTOK_SHORT_RE = re.compile(r"/(?:t/)?[A-Za-z0-9]+")
+
+HOST_PREFIXES = ("www.", "m.", "mobile.")
+SCHEMES = ("https://", "http://")
+# A host glued to one of these belongs to some other URL (evilinstagram.com, x.com/instagram.com/...).
+NOT_A_LINK_START = "._-/@"
+# Characters people (and Telegram) put right after a link.
+TRAILING_PUNCTUATION = ".,;:!?)]}»"
+
+
+class ReelLink:
+    """
+    One link found in a message. `canonical_id` (e.g. "instagram:C1a2B3c") is
+    the same for every form of the same reel; `url` is the normalized URL to
+    process. Short links have needs_resolution=True until resolved.
+    """
+
+    __slots__ = ("original", "platform", "canonical_id", "url", "needs_resolution")
+
+    def __init__(self, original, platform, canonical_id=None, url=None, needs_resolution=False):
+        self.original = original
+        self.platform = platform
+        self.canonical_id = canonical_id
+        self.url = url or original
+        self.needs_resolution = needs_resolution
+
+    def __repr__(self):
+        return f"<ReelLink({self.canonical_id or self.original}, platform={self.platform})>"
+
+
+def _match_instagram(original, path, query):
+    match = INSTAGRAM_RE.match(path)
+    if match:
+        code = match.group(1)
+        return ReelLink(original, "instagram", f"instagram:{code}", f"https://www.instagram.com/reel/{code}/")
+    if INSTAGRAM_SHARE_RE.match(path):
+        return ReelLink(original, "instagram", needs_resolution=True)
+    return None
+
+def _youtube_link(original, video_id):
+    return ReelLink(original, "youtube", f"youtube:{video_id}", f"https://www.youtube.com/shorts/{video_id}")
+
+def _match_youtube(original, path, query):
+    match = YOUTUBE_PATH_RE.match(path)
+    if match is None and path == "/watch" and query:
+        match = YOUTUBE_WATCH_QUERY_RE.search(query)
+    return _youtube_link(original, match.group(1)) if match else None
+
+def _match_youtu_be(original, path, query):
+    match = YOUTU_BE_RE.match(path)
+    return _youtube_link(original, match.group(1)) if match else None
+
+def _match_tiktok(original, path, query):
+    match = TIKTOK_RE.match(path)
+    if match:
+        user, video_id = match.groups()
+        return ReelLink(original, "tiktok", f"tiktok:{video_id}", f"https://www.tiktok.com/@{user}/video/{video_id}")
+    if path.startswith("/t/") and TIKTOK_SHORT_RE.match(path):
+        return ReelLink(original, "tiktok", needs_resolution=True)
+    return None
+
+def _match_tiktok_short(original, path, query):
+    if TIKTOK_SHORT_RE.match(path):
+        return ReelLink(original, "tiktok", needs_resolution=True)
+    return None
+
+PLATFORM_MATCHERS = {
+    "instagram.com": _match_instagram,
+    "instagr.am": _match_instagram,
+    "youtube.com": _match_youtube,
+    "youtu.be": _match_youtu_be,
+    "tiktok.com": _match_tiktok,
+    "vm.tiktok.com": _match_tiktok_short,
+    "vt.tiktok.com": _match_tiktok_short,
+}
+
+
+def _scan(text: str):
+    """Yields a ReelLink for every supported link in `text`, duplicates included."""
+    lowered = text.lower()
+    # Scheme and www. prefixes are checked case-insensitively in both paths
+    # ("Https://www.instagram.com/..." from a phone keyboard), against `folded`,
+    # which has the same indexes as `text` (lower() can change the length of
+    # some non-ASCII text).
+    folded = lowered if len(lowered) == len(text) else text
+    if any(lowered.count(hint) > text.count(hint) for hint in HOST_HINTS):
+        # At least one host is in mixed case; the case-sensitive scan would
+        # drop it even when it finds the other links.
+        matches = LINK_SCAN_ANYCASE_RE.finditer(text)
+    else:
+        first = LINK_SCAN_RE.search(text)
+        if first is None:
+            return
+        matches = LINK_SCAN_RE.finditer(text, first.start())
+    for match in matches:
+        # Widen the hit to the www./m. prefix and scheme in front of the host.
+        start = match.start()
+        for prefix in HOST_PREFIXES:
+            if folded.endswith(prefix, 0, start):
+                start -= len(prefix)
+                break
+        for scheme in SCHEMES:
+            if folded.endswith(scheme, 0, start):
+                start -= len(scheme)
+                break
+        if start and (text[start - 1].isalnum() or text[start - 1] in NOT_A_LINK_START):
+            continue
+        host, path, query = match.groups()
+        original = text[start:match.end()].rstrip(TRAILING_PUNCTUATION)
+        link = PLATFORM_MATCHERS[host.lower()](original, path, query)
+        if link is not None:
+            yield link
+
+
+def match_link(url: str):
+    """Returns a ReelLink for a single URL on a supported platform, else None."""
+    return next(_scan(url), None)
+
+
+def extract_reel_links(text: str) -> list:
+    """
+    Finds every supported reel link in `text`, in order of appearance, with
+    duplicates (same canonical ID, or the same short link) removed.
+    """
+    links = []
+    seen = set()
+    for link in _scan(text):
+        key = link.canonical_id or link.url
+        if key not in seen:
+            seen.add(key)
+            links.append(link)
+    return links
+
+
+# --- Short-Link Resolution ---
+class ShortLinkResolver:
+    """
+    Expands share/short links (vm.tiktok.com, instagram.com/share/...) by
+    following redirects. Results, including failures, are cached with a TTL so
+    a viral short link is only resolved once.
+    """
+
+    def __init__(self, ttl_seconds: float = 6 * 3600, failure_ttl_seconds: float = 300, max_entries: int = 5000, timeout: float = 10.0):
+        self.ttl_seconds = ttl_seconds
+        self.failure_ttl_seconds = failure_ttl_seconds
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._cache = collections.OrderedDict()  # short url -> (expires_at, resolved url or None)
+        self._in_flight = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def resolve(self, url: str):
+        """Returns the final URL a short link redirects to, or None."""
+        entry = self._cache.get(url)
+        if entry and entry[0] > time.monotonic():
+            self._cache.move_to_end(url)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        # Concurrent requests for the same short link share one lookup.
+        if url not in self._in_flight:
+            self._in_flight[url] = asyncio.ensure_future(self._fetch(url))
+        try:
+            resolved = await asyncio.shield(self._in_flight[url])
+        finally:
+            self._in_flight.pop(url, None)
+        return resolved
+
+    async def _fetch(self, url: str):
+        target = url if "://" in url else f"https://{url}"
+        resolved = None
+        try:
+            async with httpx.AsyncClient(follow_redirects=True, timeout=self.timeout) as client:
+                response = await client.head(target)
+                if response.status_code >= 400:
+                    # Some hosts reject HEAD; the redirect chain is the same for GET.
+                    response = await client.get(target)
+                resolved = str(response.url)
+        except httpx.HTTPError as e:
+            logger.warning(f"Could not resolve short link {url}: {e}")
+        ttl = self.ttl_seconds if resolved else self.failure_ttl_seconds
+        self._cache[url] = (time.monotonic() + ttl, resolved)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return resolved
+
+
+short_link_resolver = ShortLinkResolver()
+
+
+async def ingest_links(text: str, resolver: ShortLinkResolver = short_link_resolver) -> list:
+    """
+    Extracts, expands and dedupes the reel links in a message. Short links are
+    resolved concurrently; ones that can't be resolved to a known reel are dropped.
+    """
+    links = extract_reel_links(text)
+    pending = [link for link in links if link.needs_resolution]
+    if pending:
+        resolved_urls = await asyncio.gather(*(resolver.resolve(link.original) for link in pending))
+        for link, resolved_url in zip(pending, resolved_urls):
+            resolved = match_link(resolved_url) if resolved_url else None
+            if resolved and not resolved.needs_resolution:
+                link.canonical_id, link.url, link.needs_resolution = resolved.canonical_id, resolved.url, False
+
+    unique = []
+    seen = set()
+    for link in links:
+        if link.needs_resolution:
+            logger.info(f"Dropping unresolvable short link: {link.original}")
+            continue
+        if link.canonical_id in seen:
+            continue
+        seen.add(link.canonical_id)
+        unique.append(link)
+    return unique
+
+
+def _collect():
+    return [
+        ("reellink_short_link_cache_hits_total", {}, short_link_resolver.hits),
+        ("reellink_short_link_cache_misses_total", {}, short_link_resolver.misses),
+        ("reellink_short_link_cache_entries", {}, len(short_link_resolver._cache)),
+    ]
+
+register_collector("links", _collect)
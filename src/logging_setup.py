@@ -0,0 +1,176 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from .config import (
+    LOG_BACKUP_COUNT,
+    LOG_FILE,
+    LOG_LEVEL,
+    LOG_MAX_BYTES,
+    LOG_MAX_MESSAGE_CHARS,
+    LOG_SAMPLE_RATES,
+)
+from .metrics import register_collector
+
+# --- Queue-Based Logging ---
+# Coroutines only enqueue records; a QueueListener thread does the formatting
+# and the file/console I/O, so logging never blocks the event loop.
+
+CONSOLE_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else was passed via `extra=` and is
+# written to the JSON record as structured context.
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener = None
+_sampling_filter = None
+
+
+def truncate(text: str, limit: int = LOG_MAX_MESSAGE_CHARS) -> str:
+    """Cuts `text` to `limit` characters, noting how much was dropped."""
+    if limit and len(text) > limit:
+        return f"{text[:limit]}… [truncated {len(text) - limit} chars]"
+    return text
+
+
+def parse_sample_rates(spec: str) -> dict:
+    """Parses "logger=rate,logger=rate" into {logger: rate}."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        try:
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            print(f"Ignoring invalid LOG_SAMPLE_RATES entry: {item!r}", file=sys.stderr)
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Runs on the calling thread, so it only does cheap work: drops a sampled
+    fraction of DEBUG/INFO records per logger and trims oversized messages
+    before they sit in the queue.
+    """
+
+    def __init__(self, rates: dict, max_chars: int):
+        super().__init__()
+        # Longest prefix first, so "src.extractor" beats "src".
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+        self.max_chars = max_chars
+        self.dropped = 0
+
+    def _rate_for(self, name: str) -> float:
+        for prefix, rate in self.rates:
+            if name == prefix or name.startswith(prefix + "."):
+                return rate
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING and self.rates:
+            rate = self._rate_for(record.name)
+            if rate < 1.0 and random.random() >= rate:
+                self.dropped += 1
+                return False
+        if not record.args and isinstance(record.msg, str):
+            record.msg = truncate(record.msg, self.max_chars)
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that skips formatting on the calling thread. The stock
+    prepare() renders the message and traceback before enqueueing; since the
+    listener lives in the same process, the record can be passed through as-is.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, plus any `extra=` fields."""
+
+    def __init__(self, max_chars: int = LOG_MAX_MESSAGE_CHARS):
+        super().__init__()
+        self.max_chars = max_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": truncate(record.getMessage(), self.max_chars),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class TruncatingFormatter(logging.Formatter):
+    """Human-readable console format with the same message truncation."""
+
+    def __init__(self, fmt: str, max_chars: int = LOG_MAX_MESSAGE_CHARS):
+        super().__init__(fmt)
+        self.max_chars = max_chars
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        record.message = truncate(record.message, self.max_chars)
+        return super().formatMessage(record)
+
+
+def configure_logging(log_file: str = LOG_FILE, level: str = LOG_LEVEL, console_stream=None) -> SamplingFilter:
+    """
+    Routes the root logger through a background QueueListener that writes JSON
+    lines to a size-rotated `log_file` and plain text to the console.
+    Calling it again is a no-op. Returns the sampling filter (for its counters).
+    """
+    global _listener, _sampling_filter
+    if _listener is not None:
+        return _sampling_filter
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+    )
+    file_handler.setFormatter(JsonFormatter())
+    console_handler = logging.StreamHandler(console_stream)  # Also log to console for visibility if not run in background
+    console_handler.setFormatter(TruncatingFormatter(CONSOLE_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    sampling_filter = SamplingFilter(parse_sample_rates(LOG_SAMPLE_RATES), LOG_MAX_MESSAGE_CHARS)
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(sampling_filter)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    _sampling_filter = sampling_filter
+    # Flush whatever is still queued when the process exits.
+    atexit.register(stop_logging)
+    return sampling_filter
+
+
+def stop_logging():
+    """Stops the background writer after draining the queue."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _collect():
+    dropped = _sampling_filter.dropped if _sampling_filter else 0
+    return [("reellink_log_records_sampled_out_total", {}, dropped)]
+
+register_collector("logging", _collect)
@@ -0,0 +1,59 @@
+import asyncio
+import collections
+import logging
+from .metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag: how late a sleep of `interval` seconds wakes up.
+    Anything that blocks the loop (sync I/O, CPU work) shows up as lag, so this
+    is what the logging and process-pool benchmarks compare.
+    """
+
+    def __init__(self, interval: float = 0.05, window: int = 2000, warn_after: float = 0.5):
+        self.interval = interval
+        self.warn_after = warn_after
+        self.samples = collections.deque(maxlen=window)
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.samples.append(lag)
+            if lag > self.warn_after:
+                logger.warning(f"Event loop was blocked for {lag * 1000:.0f} ms.")
+
+    def percentile(self, pct: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def summary(self) -> dict:
+        return {
+            "samples": len(self.samples),
+            "p50_ms": self.percentile(50) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max_lag * 1000,
+        }
+
+
+loop_monitor = LoopLagMonitor()
+
+def _collect():
+    return [
+        ("reellink_event_loop_lag_seconds", {"quantile": "0.5"}, round(loop_monitor.percentile(50), 6)),
+        ("reellink_event_loop_lag_seconds", {"quantile": "0.99"}, round(loop_monitor.percentile(99), 6)),
+        ("reellink_event_loop_lag_max_seconds", {}, round(loop_monitor.max_lag, 6)),
+    ]
+
+register_collector("loop_monitor", _collect)
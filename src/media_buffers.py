@@ -0,0 +1,281 @@
+import asyncio
+import errno
+import logging
+import os
+import shutil
+import tempfile
+import psutil
+from .config import (
+    MEDIA_BUFFER_BUDGET_BYTES,
+    MEDIA_DEFAULT_RESERVATION_BYTES,
+    MEDIA_MEMORY_DIR,
+    MEDIA_MEMORY_MAX_FRACTION,
+)
+from .metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+BUFFER_DIR_NAME = "reellink-media"
+BUFFER_PREFIX = "reel-"
+
+
+class MediaBufferManager:
+    """
+    Hands out file paths for downloaded videos under a global byte budget.
+
+    Buffers go to a tmpfs directory (RAM) while there is enough free memory and
+    room on the tmpfs, counting space other in-memory buffers have reserved but
+    not written yet, and spill to the regular temp disk otherwise. A buffer that
+    outgrows the tmpfs while downloading is moved to disk (see BufferWriter).
+    When the budget is used up, new
+    downloads wait in acquire() until running ones release their buffers.
+    Every buffer lives in a directory owned by this manager, so anything left
+    behind by a crash is removed by sweep_orphans() on the next start.
+    """
+
+    def __init__(self, budget_bytes: int, default_reservation: int, memory_dir: str = None, memory_fraction: float = 0.25):
+        self.budget_bytes = budget_bytes
+        self.default_reservation = default_reservation
+        self.memory_fraction = memory_fraction
+        self.memory_dir = os.path.join(memory_dir, BUFFER_DIR_NAME) if memory_dir and os.path.isdir(memory_dir) else None
+        self.disk_dir = os.path.join(tempfile.gettempdir(), BUFFER_DIR_NAME)
+        self._buffers = {}  # path -> {"reserved": int, "in_memory": bool, "disk_path": str or None}
+        self._condition = None
+        # Usage counters
+        self.reserved_bytes = 0
+        self.memory_bytes = 0
+        self.peak_bytes = 0
+        self.waits = 0
+        self.spills = 0
+        self.moves = 0
+
+    def _get_condition(self) -> asyncio.Condition:
+        # Created lazily so it binds to the loop that actually runs the bot.
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def _memory_has_room(self, size: int) -> bool:
+        """True if in-memory buffers can hold `size` more bytes than they have reserved."""
+        if not self.memory_dir:
+            return False
+        try:
+            available = psutil.virtual_memory().available * self.memory_fraction
+            tmpfs = shutil.disk_usage(os.path.dirname(self.memory_dir))
+            written = sum(
+                os.path.getsize(path) for path, buffer in self._buffers.items()
+                if buffer["in_memory"] and os.path.exists(path)
+            )
+        except OSError:
+            return False
+        # Whatever else is on the tmpfs (other processes, files we don't own)
+        # stays; our own buffers count with their full reservation, written or not.
+        tmpfs_room = tmpfs.total - (tmpfs.used - written)
+        return self.memory_bytes + size <= min(available, tmpfs_room)
+
+    def _fits(self, size: int) -> bool:
+        # A single download bigger than the whole budget is still allowed, alone.
+        return self.reserved_bytes == 0 or self.reserved_bytes + size <= self.budget_bytes
+
+    async def acquire(self, expected_bytes: int = None, suffix: str = ".mp4") -> str:
+        """Waits for budget, then creates an empty buffer file and returns its path."""
+        size = expected_bytes or self.default_reservation
+        condition = self._get_condition()
+        async with condition:
+            if not self._fits(size):
+                self.waits += 1
+                logger.info(f"Media buffer budget full ({self.reserved_bytes}/{self.budget_bytes} bytes); waiting.")
+                await condition.wait_for(lambda: self._fits(size))
+
+            in_memory = self._memory_has_room(size)
+            directory = self.memory_dir if in_memory else self.disk_dir
+            if self.memory_dir and not in_memory:
+                self.spills += 1
+            os.makedirs(directory, exist_ok=True)
+            fd, path = tempfile.mkstemp(prefix=BUFFER_PREFIX, suffix=suffix, dir=directory)
+            os.close(fd)
+
+            self._buffers[path] = {"reserved": size, "in_memory": in_memory, "disk_path": None}
+            self._account(size, in_memory)
+        return path
+
+    def open_writer(self, path: str) -> "BufferWriter":
+        """Opens a buffer from acquire() for writing a download into it."""
+        return BufferWriter(self, path)
+
+    def resize(self, path: str, total_bytes: int) -> bool:
+        """
+        Grows a buffer's reservation to `total_bytes` (e.g. once Content-Length is
+        known, or as bytes arrive). Never blocks: a running download may overshoot
+        the budget, which only makes later acquire() calls wait longer.
+        Returns False, without growing it, if an in-memory buffer has no room
+        left on the tmpfs; the caller should spill() it.
+        """
+        buffer = self._buffers.get(path)
+        if buffer and total_bytes > buffer["reserved"]:
+            growth = total_bytes - buffer["reserved"]
+            if buffer["in_memory"] and not self._memory_has_room(growth):
+                return False
+            self._account(growth, buffer["in_memory"])
+            buffer["reserved"] = total_bytes
+        return True
+
+    def is_in_memory(self, path: str) -> bool:
+        buffer = self._buffers.get(path)
+        return bool(buffer and buffer["in_memory"])
+
+    def spill(self, path: str):
+        """
+        Moves an in-memory buffer to the disk directory. `path` stays valid (it
+        becomes a symlink to the disk copy), but open files must be reopened.
+        """
+        buffer = self._buffers.get(path)
+        if not buffer or not buffer["in_memory"]:
+            return
+        os.makedirs(self.disk_dir, exist_ok=True)
+        fd, disk_path = tempfile.mkstemp(prefix=BUFFER_PREFIX, suffix=os.path.splitext(path)[1], dir=self.disk_dir)
+        os.close(fd)
+        shutil.copyfile(path, disk_path)
+        link = path + ".link"
+        os.symlink(disk_path, link)
+        os.replace(link, path)  # frees the tmpfs copy once the writer closes it
+
+        self._account(-buffer["reserved"], True)
+        self._account(buffer["reserved"], False)
+        buffer["in_memory"] = False
+        buffer["disk_path"] = disk_path
+        self.moves += 1
+        logger.info(f"Moved media buffer {path} to disk ({disk_path}): no room left on the tmpfs.")
+
+    async def release(self, path: str):
+        """Deletes a buffer file and returns its bytes to the budget."""
+        buffer = self._buffers.pop(path, None)
+        disk_path = buffer["disk_path"] if buffer else None
+        for file_path in filter(None, (path, disk_path)):
+            if not os.path.lexists(file_path):
+                continue
+            logger.info(f"Cleaning up temporary file: {file_path}")
+            try:
+                os.remove(file_path)
+            except OSError as e:
+                logger.error(f"Error removing temp file {file_path}: {e}")
+
+        if buffer:
+            self._account(-buffer["reserved"], buffer["in_memory"])
+            condition = self._get_condition()
+            async with condition:
+                condition.notify_all()
+
+    def _account(self, delta: int, in_memory: bool):
+        self.reserved_bytes += delta
+        if in_memory:
+            self.memory_bytes += delta
+        self.peak_bytes = max(self.peak_bytes, self.reserved_bytes)
+
+    def sweep_orphans(self) -> int:
+        """Removes buffer files that no running download owns (e.g. after a crash)."""
+        removed = 0
+        owned = set(self._buffers) | {buffer["disk_path"] for buffer in self._buffers.values()}
+        for directory in filter(None, (self.memory_dir, self.disk_dir)):
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if not name.startswith(BUFFER_PREFIX) or path in owned:
+                    continue
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError as e:
+                    logger.warning(f"Could not remove orphaned media buffer {path}: {e}")
+        if removed:
+            logger.info(f"Swept {removed} orphaned media buffer(s).")
+        return removed
+
+    def usage(self) -> dict:
+        return {
+            "active_buffers": len(self._buffers),
+            "reserved_bytes": self.reserved_bytes,
+            "memory_bytes": self.memory_bytes,
+            "peak_bytes": self.peak_bytes,
+            "budget_bytes": self.budget_bytes,
+            "waits": self.waits,
+            "spills": self.spills,
+            "moves": self.moves,
+        }
+
+
+class BufferWriter:
+    """
+    Writes a download into a media buffer and keeps its reservation in step
+    with the bytes written. If an in-memory buffer can't grow (no room left on
+    the tmpfs, or ENOSPC because something else filled it), the buffer is moved
+    to disk and writing continues there instead of failing the download.
+    """
+
+    def __init__(self, manager: MediaBufferManager, path: str):
+        self.manager = manager
+        self.path = path
+        self.written = 0
+        # Unbuffered, so after ENOSPC the file holds exactly `written` bytes.
+        self._file = open(path, "wb", buffering=0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def expect(self, total_bytes: int):
+        """Reserves the whole download up front (e.g. from Content-Length)."""
+        self._reserve(total_bytes)
+
+    def write(self, data: bytes):
+        self._reserve(self.written + len(data))
+        view = memoryview(data)
+        while view:
+            try:
+                count = self._file.write(view)
+            except OSError as e:
+                if e.errno != errno.ENOSPC or not self.manager.is_in_memory(self.path):
+                    raise
+                self._spill()
+                continue
+            view = view[count:]
+            self.written += count
+
+    def close(self):
+        self._file.close()
+
+    def _reserve(self, total_bytes: int):
+        if not self.manager.resize(self.path, total_bytes):
+            self._spill()
+            self.manager.resize(self.path, total_bytes)
+
+    def _spill(self):
+        self._file.close()
+        self.manager.spill(self.path)
+        self._file = open(self.path, "ab", buffering=0)
+
+
+media_buffers = MediaBufferManager(
+    MEDIA_BUFFER_BUDGET_BYTES,
+    MEDIA_DEFAULT_RESERVATION_BYTES,
+    memory_dir=MEDIA_MEMORY_DIR,
+    memory_fraction=MEDIA_MEMORY_MAX_FRACTION,
+)
+
+def _collect():
+    usage = media_buffers.usage()
+    return [
+        ("reellink_media_buffers_active", {}, usage["active_buffers"]),
+        ("reellink_media_buffer_bytes", {"storage": "total"}, usage["reserved_bytes"]),
+        ("reellink_media_buffer_bytes", {"storage": "memory"}, usage["memory_bytes"]),
+        ("reellink_media_buffer_peak_bytes", {}, usage["peak_bytes"]),
+        ("reellink_media_buffer_budget_bytes", {}, usage["budget_bytes"]),
+        ("reellink_media_buffer_waits_total", {}, usage["waits"]),
+        ("reellink_media_buffer_spills_total", {}, usage["spills"]),
+        ("reellink_media_buffer_moves_total", {}, usage["moves"]),
+    ]
+
+register_collector("media_buffers", _collect)
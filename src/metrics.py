@@ -0,0 +1,34 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# --- Metrics Registry ---
+# Modules register a collector that returns their current values; the API
+# wrapper renders them all in Prometheus text format on GET /metrics.
+# A collector returns a list of (metric_name, labels_dict, value) tuples.
+_COLLECTORS = {}
+
+def register_collector(name, collector):
+    """Registers (or replaces) a named collector callable."""
+    _COLLECTORS[name] = collector
+
+def collect():
+    """Returns every (metric_name, labels, value) sample from all collectors."""
+    samples = []
+    for name, collector in list(_COLLECTORS.items()):
+        try:
+            samples.extend(collector())
+        except Exception as e:
+            logger.error(f"Metrics collector '{name}' failed: {e}")
+    return samples
+
+def render_prometheus() -> str:
+    """Renders all collected samples in the Prometheus text exposition format."""
+    lines = []
+    for metric, labels, value in collect():
+        if labels:
+            label_text = ",".join(f'{key}="{val}"' for key, val in sorted(labels.items()))
+            lines.append(f"{metric}{{{label_text}}} {value}")
+        else:
+            lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
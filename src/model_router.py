@@ -0,0 +1,317 @@
+import asyncio
+import logging
+import time
+from .config import (
+    GEMINI_DEFAULT_RPM,
+    GEMINI_MODEL_CONCURRENCY,
+    GEMINI_MODEL_RPM,
+    GEMINI_MODEL_TIERS,
+    ROUTER_CAPTION_RICH_CHARS,
+    ROUTER_EWMA_ALPHA,
+    ROUTER_PROBE_EVERY,
+    ROUTER_SHORT_VIDEO_SECONDS,
+    ROUTER_USER_RESERVE_FRACTION,
+)
+from .metrics import register_collector
+from .resilience import ServiceDegradedError, get_breaker, resilient_call
+
+logger = logging.getLogger(__name__)
+
+# How often a background call re-checks whether it may start.
+BACKGROUND_POLL_SECONDS = 1.0
+
+
+class ModelRateLimitedError(ServiceDegradedError):
+    """Raised instead of retrying a model that answered 429: its RPM budget is spent."""
+
+    def __init__(self, model_name: str, retry_after: float):
+        self.model_name = model_name
+        super().__init__("gemini", retry_after)
+
+
+def _is_rate_limited(exc: Exception) -> bool:
+    # google.api_core's TooManyRequests (and HTTP errors generally) carry the status as `code`.
+    return getattr(exc, "code", None) == 429
+
+
+def parse_model_rpm(spec: str) -> dict:
+    """Parses "model=rpm,model=rpm" into {model: rpm}."""
+    budgets = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rpm = item.partition("=")
+        try:
+            budgets[name.strip()] = max(0.1, float(rpm))
+        except ValueError:
+            logger.warning(f"Ignoring invalid GEMINI_MODEL_RPM entry: {item!r}")
+    return budgets
+
+
+# --- Per-Model Rate Budget ---
+class TokenBucket:
+    """A requests-per-minute budget that refills continuously and bursts up to one minute's worth."""
+
+    def __init__(self, rpm: float):
+        self.rate = rpm / 60.0
+        self.capacity = max(1.0, rpm)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self) -> bool:
+        self._refill()
+        return self.tokens >= 1.0
+
+    def wait_time(self) -> float:
+        self._refill()
+        return max(0.0, (1.0 - self.tokens) / self.rate)
+
+    async def take(self):
+        """Waits until a request fits in the budget, then spends it."""
+        while not self.available():
+            await asyncio.sleep(self.wait_time())
+        self.tokens -= 1.0
+
+    def drain(self):
+        """Empties the budget, e.g. after the API said the real quota is used up."""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+# --- Online Model Statistics ---
+class ModelStats:
+    """Moving averages of one model's latency, error rate and useful-answer rate."""
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.latency = None  # seconds, EWMA of successful calls
+        self.error_rate = 0.0
+        self.success_rate = 1.0  # optimistic, so an untried model gets its chance
+        # Counters exported as metrics
+        self.calls = 0
+        self.errors = 0
+        self.useful = 0
+        self.misses = 0
+
+    def _ewma(self, current, sample):
+        return sample if current is None else current + self.alpha * (sample - current)
+
+    def record_call(self, seconds: float):
+        self.calls += 1
+        self.latency = self._ewma(self.latency, seconds)
+        self.error_rate = self._ewma(self.error_rate, 0.0)
+
+    def record_error(self):
+        self.calls += 1
+        self.errors += 1
+        self.error_rate = self._ewma(self.error_rate, 1.0)
+
+    def record_outcome(self, useful: bool):
+        if useful:
+            self.useful += 1
+        else:
+            self.misses += 1
+        self.success_rate = self._ewma(self.success_rate, 1.0 if useful else 0.0)
+
+    @property
+    def answer_rate(self) -> float:
+        """Chance that a request to this model ends in a usable answer."""
+        return self.success_rate * (1.0 - self.error_rate)
+
+
+# --- Router ---
+class ModelRouter:
+    """
+    Picks which Gemini model(s) to ask about a reel.
+
+    Models are ordered cheapest first. Short or caption-rich reels start on the
+    cheapest model that is still worth it (its latency, plus the strongest
+    model's latency weighted by the chance of a miss, beats asking the
+    strongest model directly) and escalate on an N/A or unparsable answer;
+    every other reel goes straight to the strongest model. Each model has its
+    own RPM budget, and a request whose first choice is out of budget moves to
+    a tier that still has some. Background calls only start while no user call
+    is in flight and the model has more than `user_reserve` of its budget left.
+    """
+
+    def __init__(self, tiers: list, rpm: dict, default_rpm: float, concurrency: int,
+                 short_seconds: float, caption_chars: int, alpha: float, probe_every: int,
+                 user_reserve: float = 0.5):
+        self.tiers = list(tiers)
+        self.user_reserve = user_reserve
+        self.short_seconds = short_seconds
+        self.caption_chars = caption_chars
+        self.probe_every = max(1, probe_every)
+        self.stats = {model: ModelStats(alpha) for model in self.tiers}
+        self.buckets = {model: TokenBucket(rpm.get(model, default_rpm)) for model in self.tiers}
+        self.semaphores = {model: asyncio.Semaphore(concurrency) for model in self.tiers}
+        self.breakers = {model: get_breaker(f"gemini:{model.rsplit('/', 1)[-1]}") for model in self.tiers}
+        self._light_reels = 0
+        self.user_calls = 0  # user generate() calls waiting or running
+        # Counters exported as metrics
+        self.escalations = 0
+        self.budget_reroutes = 0
+        self.rate_limited = 0
+
+    def is_light(self, duration: float = None, caption: str = None) -> bool:
+        """Short or caption-rich reels are usually answered by a cheaper model."""
+        if duration is not None and duration <= self.short_seconds:
+            return True
+        return bool(caption) and len(caption) >= self.caption_chars
+
+    def _worth_trying(self, model: str) -> bool:
+        cheap, strong = self.stats[model], self.stats[self.tiers[-1]]
+        if cheap.latency is None or strong.latency is None:
+            return True
+        return cheap.latency + (1.0 - cheap.answer_rate) * strong.latency < strong.latency
+
+    def plan(self, duration: float = None, caption: str = None) -> list:
+        """Returns the models to try, in order; later ones are the escalation path."""
+        start = len(self.tiers) - 1
+        if self.is_light(duration, caption):
+            self._light_reels += 1
+            # Every Nth light reel probes from the bottom, so a tier that was
+            # skipped on stale numbers gets fresh ones.
+            probe = self._light_reels % self.probe_every == 0
+            start = next(
+                (i for i, model in enumerate(self.tiers[:-1]) if probe or self._worth_trying(model)),
+                start,
+            )
+        order = self.tiers[start:]
+
+        if not self.buckets[order[0]].available():
+            # Out of budget this minute: a stronger tier with budget takes over,
+            # else a cheaper one goes first (and escalates back if needed).
+            for alternative in self.tiers[start + 1:] + self.tiers[:start][::-1]:
+                if self.buckets[alternative].available():
+                    self.budget_reroutes += 1
+                    if self.tiers.index(alternative) > start:
+                        order = self.tiers[self.tiers.index(alternative):]
+                    else:
+                        order = [alternative] + order
+                    break
+        return order
+
+    def fallback(self, tried: list):
+        """Returns a model outside `tried` that still has RPM budget (strongest first), or None."""
+        for model in reversed(self.tiers):
+            if model not in tried and self.buckets[model].available():
+                self.budget_reroutes += 1
+                return model
+        return None
+
+    def has_spare_budget(self, model_name: str = None) -> bool:
+        """True if background work may spend a request on `model_name` (default: on every tier)."""
+        for model in [model_name] if model_name else self.tiers:
+            bucket = self.buckets[model]
+            if not bucket.available() or bucket.tokens - 1.0 < bucket.capacity * self.user_reserve:
+                return False
+        return True
+
+    async def _wait_for_background_turn(self, model_name: str):
+        # A running thread can't be cancelled, so the check happens before it starts.
+        while self.user_calls or not self.has_spare_budget(model_name):
+            await asyncio.sleep(BACKGROUND_POLL_SECONDS)
+
+    async def generate(self, genai, model_name: str, call, retry_if=None, counts_as_failure=None,
+                       background: bool = False):
+        """
+        Runs the blocking `call(model)` for `model_name` in a thread, inside that
+        model's concurrency limit, RPM budget and circuit breaker. Raises
+        ServiceDegradedError if the model's breaker is open. Errors that
+        `counts_as_failure(exc)` rejects leave the breaker and error rate alone.
+        `background` calls wait until no user call is in flight and the model
+        has spare budget.
+
+        Every attempt, retries included, spends a token. A 429 isn't retried:
+        it drains the model's budget and raises ModelRateLimitedError, so the
+        caller escalates or reroutes to a tier that still has budget.
+        """
+        if background:
+            await self._wait_for_background_turn(model_name)
+        else:
+            self.user_calls += 1
+        try:
+            return await self._generate(genai, model_name, call, retry_if, counts_as_failure)
+        finally:
+            if not background:
+                self.user_calls -= 1
+
+    async def _generate(self, genai, model_name: str, call, retry_if, counts_as_failure):
+        model = genai.GenerativeModel(model_name=model_name)
+        stats = self.stats[model_name]
+        bucket = self.buckets[model_name]
+
+        async def attempt():
+            await bucket.take()
+            try:
+                return await asyncio.to_thread(call, model)
+            except Exception as e:
+                if _is_rate_limited(e):
+                    self.rate_limited += 1
+                    bucket.drain()
+                    raise ModelRateLimitedError(model_name, bucket.wait_time()) from e
+                raise
+
+        def counts(exc):
+            # Running out of quota says nothing about the model's health.
+            if isinstance(exc, ModelRateLimitedError):
+                return False
+            return not counts_as_failure or counts_as_failure(exc)
+
+        async with self.semaphores[model_name]:
+            started = time.perf_counter()
+            try:
+                response = await resilient_call(
+                    self.breakers[model_name], attempt, retry_if=retry_if, counts_as_failure=counts
+                )
+            except ServiceDegradedError:
+                raise
+            except Exception as e:
+                if not counts_as_failure or counts_as_failure(e):
+                    stats.record_error()
+                raise
+        stats.record_call(time.perf_counter() - started)
+        return response
+
+    def record_outcome(self, model_name: str, useful: bool, escalating: bool = False):
+        self.stats[model_name].record_outcome(useful)
+        if escalating:
+            self.escalations += 1
+
+
+model_router = ModelRouter(
+    GEMINI_MODEL_TIERS,
+    parse_model_rpm(GEMINI_MODEL_RPM),
+    GEMINI_DEFAULT_RPM,
+    GEMINI_MODEL_CONCURRENCY,
+    ROUTER_SHORT_VIDEO_SECONDS,
+    ROUTER_CAPTION_RICH_CHARS,
+    ROUTER_EWMA_ALPHA,
+    ROUTER_PROBE_EVERY,
+    ROUTER_USER_RESERVE_FRACTION,
+)
+
+def _collect():
+    samples = [
+        ("reellink_model_escalations_total", {}, model_router.escalations),
+        ("reellink_model_budget_reroutes_total", {}, model_router.budget_reroutes),
+        ("reellink_model_rate_limited_total", {}, model_router.rate_limited),
+    ]
+    for model, stats in model_router.stats.items():
+        labels = {"model": model}
+        samples += [
+            ("reellink_model_calls_total", labels, stats.calls),
+            ("reellink_model_errors_total", labels, stats.errors),
+            ("reellink_model_useful_answers_total", labels, stats.useful),
+            ("reellink_model_missed_answers_total", labels, stats.misses),
+            ("reellink_model_latency_ewma_seconds", labels, round(stats.latency or 0.0, 3)),
+            ("reellink_model_answer_rate", labels, round(stats.answer_rate, 3)),
+            ("reellink_model_rpm_tokens", labels, round(model_router.buckets[model].tokens, 2)),
+        ]
+    return samples
+
+register_collector("model_router", _collect)
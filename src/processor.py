@@ -1,36 +1,105 @@
 import asyncio
+import json
 import os
 import subprocess
 import logging
 import re
 import urllib.parse
 from urllib.parse import urlparse
-import tempfile
+import threading
+import time
 import httpx
-from .extractor import extract_tool_info_with_ai
-from googleapiclient.discovery import build
-from .config import GOOGLE_API_KEY, GOOGLE_CSE_ID
-
-# --- Necessary Imports ---
-# Ensures all required modules are imported at the top level to prevent NameErrors.
-import tempfile
-import httpx
-from googleapiclient.discovery import build
+from .extractor import delete_uploaded_file, extract_tool_info_with_ai, gemini_breaker
+from .config import GOOGLE_API_KEY, GOOGLE_CSE_ID, YTDLP_HEDGE_DELAY, YTDLP_TIMEOUT, DOWNLOAD_TIMEOUT, GEMINI_STREAMING_UPLOAD
+from .media_buffers import media_buffers
+from .result_cache import canonical_reel_key, result_cache
+from .cpu_tasks import hash_file
+from .workers import worker_pool
+from .streaming_upload import StreamingUploadError, record_video_ready, stream_download_to_gemini
+from .resilience import ServiceDegradedError, TransientError, get_breaker, hedged, resilient_call, resilient_call_sync
 
 logger = logging.getLogger(__name__)
 
+# --- Circuit Breakers ---
+ytdlp_breaker = get_breaker("yt_dlp")
+download_breaker = get_breaker("video_download")
+search_breaker = get_breaker("google_cse")
+
+# yt-dlp errors that mean "this reel can't be fetched", not "yt-dlp/Instagram is down".
+# These are not retried and don't count against the breaker.
+YTDLP_PERMANENT_ERRORS = (
+    "Unsupported URL",
+    "Video unavailable",
+    "is not available",
+    "Private video",
+    "This content isn't available",
+    "HTTP Error 404",
+)
+
+# Friendly names for the breakers, used in the "service degraded" replies.
+SERVICE_NAMES = {
+    "yt_dlp": "Video lookup",
+    "video_download": "Video download",
+    "gemini": "AI analysis",
+    "google_cse": "Link search",
+}
+
+def degraded_message(service: str, retry_after: float) -> str:
+    name = SERVICE_NAMES.get(service, service)
+    minutes = max(1, round(retry_after / 60))
+    return f"⚠️ {name} is degraded right now, so I stopped early instead of making you wait. Please try again in about {minutes} min."
+
+# --- Lazy Custom Search Client ---
+# googleapiclient is slow to import and build() parses the discovery document,
+# so the service is created on the first search and reused afterwards. The
+# underlying httplib2 connection isn't thread-safe, hence one per thread.
+_search_local = threading.local()
+
+def get_search_service():
+    """Returns this thread's Custom Search service, building it on first use."""
+    service = getattr(_search_local, "service", None)
+    if service is None:
+        from googleapiclient.discovery import build
+        service = build("customsearch", "v1", developerKey=GOOGLE_API_KEY, cache_discovery=False)
+        _search_local.service = service
+    return service
+
+def preload_search_client():
+    """
+    Imports googleapiclient ahead of the first search. Only the import is
+    shared: the service itself is built per thread by get_search_service(), so
+    building one here would only serve whichever executor thread ran this.
+    """
+    import googleapiclient.discovery  # noqa: F401
+
+def _is_transient_http_error(exc: Exception) -> bool:
+    status = getattr(getattr(exc, "resp", None), "status", None)
+    return status is not None and (int(status) == 429 or int(status) >= 500)
+
+def _is_search_failure(exc: Exception) -> bool:
+    """Any 4xx other than 429 (e.g. a 400 for a bad query) is about the request, not the API."""
+    status = getattr(getattr(exc, "resp", None), "status", None)
+    return status is None or _is_transient_http_error(exc)
+
 # --- Google Search Function ---
 def google_search(query, num_results=5):
     """
     Uses the Official Google Custom Search JSON API.
+    Blocking; call it from a worker thread. Raises ServiceDegradedError when
+    the search breaker is open.
     """
     logger.info(f"Searching via Google API for: {query}")
     if not GOOGLE_API_KEY or not GOOGLE_CSE_ID:
         logger.error("Google API Key or CSE ID are not configured.")
         return []
     try:
-        service = build("customsearch", "v1", developerKey=GOOGLE_API_KEY)
-        res = service.cse().list(q=query, cx=GOOGLE_CSE_ID, num=num_results).execute()
+        service = get_search_service()
+        res = resilient_call_sync(
+            search_breaker,
+            service.cse().list(q=query, cx=GOOGLE_CSE_ID, num=num_results).execute,
+            retry_if=_is_transient_http_error,
+            counts_as_failure=_is_search_failure,
+        )
         
         results = []
         if 'items' in res:
@@ -44,6 +113,8 @@ def google_search(query, num_results=5):
         else:
             logger.warning(f"Google API returned no items for '{query}'.")
         return results
+    except ServiceDegradedError:
+        raise
     except Exception as e:
         logger.error(f"Google Search API failed: {e}")
         return []
@@ -81,79 +152,296 @@ def find_direct_link(data):
     # Fallback: Return the first result if no specific match found
     return results[0]['link'] if results else None
 
-# --- Video Streaming to Temp File ---
-async def stream_video_to_temp_file(url: str) -> str:
+# --- Video URL Resolution ---
+async def _run_yt_dlp(url: str, cookie_file: str):
     """
-    Gets the direct video URL and streams it to a temporary file on disk,
-    which acts as a buffer and is deleted immediately after use.
+    Runs one yt-dlp resolution. Returns {"video_url", "uploader", "duration",
+    "description"}, or None for permanent failures.
     """
-    cookie_file = "instagram_cookies.txt"
-    if not os.path.exists(cookie_file):
-        logger.error(f"FATAL: Cookie file '{cookie_file}' not found.")
-        return None
-
-    yt_dlp_command = ["yt-dlp", "--get-url", url, "--cookies", cookie_file]
-    
-    logger.info(f"Getting video URL for {url}")
+    # Metadata lines are prefixed so they can't be mistaken for one of the URLs;
+    # the description is JSON-encoded to keep it on one line.
+    yt_dlp_command = [
+        "yt-dlp",
+        "--print", "uploader:%(uploader_id)s",
+        "--print", "duration:%(duration)s",
+        "--print", "description:%(description)j",
+        "--get-url", url, "--cookies", cookie_file,
+    ]
     process = await asyncio.create_subprocess_exec(
         *yt_dlp_command,
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE
     )
-    stdout, stderr = await process.communicate()
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=YTDLP_TIMEOUT)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise TransientError(f"yt-dlp timed out after {YTDLP_TIMEOUT:.0f}s")
+    except asyncio.CancelledError:
+        # Lost a hedge race (or the job was cancelled): don't leave yt-dlp running.
+        process.kill()
+        raise
 
     if process.returncode != 0:
-        logger.error(f"yt-dlp failed to get video URL for {url}. Error: {stderr.decode()}")
+        error = stderr.decode(errors="replace").strip()
+        if any(marker in error for marker in YTDLP_PERMANENT_ERRORS):
+            logger.error(f"yt-dlp cannot fetch {url}. Error: {error}")
+            return None
+        raise TransientError(f"yt-dlp exited with code {process.returncode}: {error[-300:]}")
+
+    uploader = None
+    duration = None
+    description = None
+    urls = []
+    for line in stdout.decode().strip().split('\n'):
+        if line.startswith("uploader:"):
+            uploader = line[len("uploader:"):].strip() or None
+            if uploader == "NA":
+                uploader = None
+        elif line.startswith("duration:"):
+            try:
+                duration = float(line[len("duration:"):])
+            except ValueError:
+                duration = None  # "NA" when the extractor doesn't know
+        elif line.startswith("description:"):
+            try:
+                description = json.loads(line[len("description:"):]) or None
+            except ValueError:
+                description = None
+        elif line.strip():
+            urls.append(line.strip())
+    if not urls:
+        raise TransientError(f"yt-dlp returned no video URL for {url}")
+    return {"video_url": urls[-1], "uploader": uploader, "duration": duration, "description": description} # Get the last URL
+
+async def resolve_video_info(url: str):
+    """
+    Resolves the direct video URL (and uploader) with yt-dlp. Slow resolutions are hedged with a
+    second yt-dlp process, and transient failures are retried with backoff.
+    Raises ServiceDegradedError when the yt-dlp breaker is open.
+    """
+    cookie_file = "instagram_cookies.txt"
+    if not os.path.exists(cookie_file):
+        logger.error(f"FATAL: Cookie file '{cookie_file}' not found.")
         return None
-    
-    video_url = stdout.decode().strip().split('\n')[-1] # Get the last URL
-    logger.info("Successfully got video URL.")
 
+    logger.info(f"Getting video URL for {url}")
+    try:
+        video_info = await resilient_call(
+            ytdlp_breaker, hedged, "yt_dlp", lambda: _run_yt_dlp(url, cookie_file), YTDLP_HEDGE_DELAY
+        )
+    except TransientError as e:
+        logger.error(f"yt-dlp failed to get video URL for {url}. Error: {e}")
+        return None
+
+    if video_info:
+        logger.info("Successfully got video URL.")
+    return video_info
+
+# --- Video Streaming to Temp File ---
+def _is_dependency_failure(exc: Exception) -> bool:
+    """
+    Only CDN errors count against the download breaker: 429, 5xx and transport
+    failures (raised as TransientError). A 4xx means this media URL is expired,
+    private or gone, and a local OSError (e.g. disk full) isn't the CDN's fault.
+    """
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(exc, (TransientError, httpx.HTTPError))
+
+async def _download_to_file(video_url: str, path: str):
+    """Streams one download attempt into `path`, classifying retryable failures."""
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as temp_f:
-            temp_video_path = temp_f.name
-        
         async with httpx.AsyncClient() as client:
-            async with client.stream("GET", video_url, follow_redirects=True, timeout=60.0) as response:
+            async with client.stream("GET", video_url, follow_redirects=True, timeout=DOWNLOAD_TIMEOUT) as response:
                 response.raise_for_status()
-                with open(temp_video_path, "wb") as f:
+                content_length = response.headers.get("Content-Length")
+                with media_buffers.open_writer(path) as writer:
+                    if content_length and content_length.isdigit():
+                        writer.expect(int(content_length))
                     async for chunk in response.aiter_bytes():
-                        f.write(chunk)
-        
+                        writer.write(chunk)
+    except httpx.HTTPStatusError as e:
+        status = e.response.status_code
+        if status == 429 or status >= 500:
+            raise TransientError(f"video CDN returned HTTP {status}") from e
+        raise
+    except httpx.TransportError as e:
+        raise TransientError(f"{type(e).__name__}: {e}") from e
+
+async def stream_video_to_temp_file(video_url: str) -> str:
+    """
+    Streams a direct video URL into a media buffer (tmpfs or disk, under the
+    global byte budget), which is released immediately after use.
+    Raises ServiceDegradedError when the download breaker is open.
+    """
+    # Waits here while the media buffer budget is used up by other downloads.
+    temp_video_path = await media_buffers.acquire(suffix=".mp4")
+    try:
+        await resilient_call(
+            download_breaker, _download_to_file, video_url, temp_video_path, counts_as_failure=_is_dependency_failure
+        )
+
         logger.info(f"Successfully streamed video to temporary file: {temp_video_path}")
         return temp_video_path
-    except httpx.TimeoutException as e:
-        logger.error(f"Timeout while streaming video to temp file: {e}")
-        if 'temp_video_path' in locals() and os.path.exists(temp_video_path):
-            os.remove(temp_video_path)
-        return "TIMEOUT"
+    except ServiceDegradedError:
+        await media_buffers.release(temp_video_path)
+        raise
+    except TransientError as e:
+        logger.error(f"Error streaming video to temp file after retries: {e}")
+        await media_buffers.release(temp_video_path)
+        if isinstance(e.__cause__, httpx.TimeoutException):
+            return "TIMEOUT"
+        return None
+    except asyncio.CancelledError:
+        await media_buffers.release(temp_video_path)
+        raise
     except Exception as e:
         logger.error(f"Error streaming video to temp file: {e}")
-        if 'temp_video_path' in locals() and os.path.exists(temp_video_path):
-            os.remove(temp_video_path)
+        await media_buffers.release(temp_video_path)
         return None
 
+# --- Streaming Download + Upload ---
+def _is_upload_failure(exc: Exception) -> bool:
+    """
+    Whether a failed streamed upload counts against the gemini breaker. Like
+    _is_dependency_failure: a Files API 4xx other than 429 (found anywhere in
+    the cause chain) is about this upload, not the API's health.
+    """
+    cause = exc.__cause__
+    while cause is not None:
+        if isinstance(cause, httpx.HTTPStatusError):
+            status = cause.response.status_code
+            return status == 429 or status >= 500
+        cause = cause.__cause__
+    return True
+
+async def stream_video_to_gemini(video_url: str, timings: dict):
+    """
+    Downloads the video while uploading it to a Gemini resumable session, so the
+    upload finishes shortly after the download instead of starting after it.
+    The bytes are still written to a media buffer, which is the fallback: if the
+    upload fails it is redone from disk, and if the download fails it is retried
+    on the regular temp-file path. Returns (path, uploaded_file_name or None).
+    """
+    gemini_breaker.before_call()
+    temp_video_path = await media_buffers.acquire(suffix=".mp4")
+    started = time.perf_counter()
+    try:
+        file_resource = await stream_download_to_gemini(video_url, temp_video_path, os.path.basename(temp_video_path))
+    except StreamingUploadError as e:
+        logger.warning(f"Streaming upload failed ({e}); falling back to the temp-file path.")
+        if e.download_complete:
+            if _is_upload_failure(e):
+                gemini_breaker.record_failure()
+            else:
+                gemini_breaker.record_success()
+            timings["download_s"] = time.perf_counter() - started
+            return temp_video_path, None
+        gemini_breaker.record_cancelled()
+        await media_buffers.release(temp_video_path)
+        download_started = time.perf_counter()
+        path = await stream_video_to_temp_file(video_url)
+        timings["download_s"] = time.perf_counter() - download_started
+        return path, None
+    except BaseException:
+        gemini_breaker.record_cancelled()
+        await media_buffers.release(temp_video_path)
+        raise
+
+    gemini_breaker.record_success()
+    timings["download_s"] = file_resource["timings"].get("download_s", 0.0)
+    timings["video_ready_s"] = time.perf_counter() - started
+    record_video_ready("streamed", timings["video_ready_s"])
+    logger.info(
+        f"Streamed {video_url[:60]}... to Gemini as {file_resource['name']}: download {timings['download_s']:.2f}s, "
+        f"video ready {timings['video_ready_s']:.2f}s."
+    )
+    return temp_video_path, file_resource["name"]
+
 # --- Main Reel Processing Orchestrator ---
-async def process_reel(reel_url: str) -> dict:
+async def process_reel(reel_url: str, refresh: bool = False, background: bool = False) -> dict:
     """
     Orchestrates the entire process for a single reel using the robust stream-to-temp-file method.
+    Answers from the result cache when possible; `refresh=True` (used by the
+    cache warmer) always runs the full pipeline and re-caches the result, and
+    `background=True` makes its Gemini inference yield to user requests.
+    The returned dict carries this run's stage durations under "timings".
     """
+    timings = {}
+    started = time.perf_counter()
+    result = await _run_pipeline(reel_url, refresh, timings, background)
+    timings["total_s"] = time.perf_counter() - started
+    # A copy, so cached results never hold one run's timings.
+    return dict(result, timings=timings)
+
+async def _run_pipeline(reel_url: str, refresh: bool, timings: dict, background: bool = False) -> dict:
+    cache_key = canonical_reel_key(reel_url)
+    if not refresh:
+        cached = result_cache.get(cache_key)
+        if cached:
+            logger.info(f"Cache hit for reel {reel_url}.")
+            return dict(cached, cache_hit=True)
+
     logger.info(f"Processing reel: {reel_url}")
     
     temp_video_path = None
+    uploaded_file_name = None
     try:
-        temp_video_path = await stream_video_to_temp_file(reel_url)
+        try:
+            stage_started = time.perf_counter()
+            video_info = await resolve_video_info(reel_url)
+            timings["resolve_s"] = time.perf_counter() - stage_started
+            if not video_info:
+                return {"tool_name": "Error", "final_message": "Could not download or process video."}
+            if GEMINI_STREAMING_UPLOAD:
+                temp_video_path, uploaded_file_name = await stream_video_to_gemini(video_info["video_url"], timings)
+            else:
+                stage_started = time.perf_counter()
+                temp_video_path = await stream_video_to_temp_file(video_info["video_url"])
+                timings["download_s"] = time.perf_counter() - stage_started
+        except ServiceDegradedError as e:
+            logger.warning(f"Failing fast for reel {reel_url}: {e}")
+            return {"tool_name": "Error", "final_message": degraded_message(e.service, e.retry_after)}
         
         if temp_video_path == "TIMEOUT":
             return {"tool_name": "Error", "final_message": "Could not download video: The connection timed out. Please check your internet connection and try again."}
         if not temp_video_path:
             return {"tool_name": "Error", "final_message": "Could not download or process video."}
         
+        # Fingerprint the video in the worker pool: the same clip reposted under
+        # another URL is answered from the cache without another Gemini call.
+        content_key = None
+        try:
+            content_key = "sha256:" + await worker_pool.run(hash_file, temp_video_path)
+        except Exception as e:
+            logger.warning(f"Could not fingerprint {temp_video_path}: {e}")
+        if content_key and not refresh:
+            cached = result_cache.get(content_key)
+            if cached:
+                logger.info(f"Content cache hit for reel {reel_url}.")
+                result_cache.put(cache_key, cached)
+                if uploaded_file_name:
+                    asyncio.create_task(delete_uploaded_file(uploaded_file_name))
+                return dict(cached, cache_hit=True)
+
         logger.info(f"Video streamed to {temp_video_path}. Proceeding with AI extraction.")
-        tool_data = await extract_tool_info_with_ai(temp_video_path)
+        tool_data = await extract_tool_info_with_ai(
+            temp_video_path, uploaded_file_name=uploaded_file_name, timings=timings,
+            duration=video_info.get("duration"), caption=video_info.get("description"),
+            background=background,
+        )
+        if not uploaded_file_name and "upload_s" in timings:
+            timings["video_ready_s"] = timings.get("download_s", 0.0) + timings["upload_s"]
+            record_video_ready("temp_file", timings["video_ready_s"])
         
         if tool_data.get("tool_name") == "AI_TIMEOUT":
             return {"tool_name": "Error", "final_message": "The AI analysis timed out, which can happen with very long videos or slow connections. Please try again."}
+
+        if tool_data.get("tool_name") == "DEGRADED":
+            return {"tool_name": "Error", "final_message": degraded_message(tool_data.get("service"), tool_data.get("retry_after", 60))}
         
         if not tool_data or tool_data.get("tool_name") == "N/A":
             logger.warning(f"Tool not identified for reel {reel_url}.")
@@ -165,26 +453,36 @@ async def process_reel(reel_url: str) -> dict:
             return {"tool_name": "Error", "final_message": error_message}
         
         logger.info(f"AI extracted data: {tool_data}. Now finding direct link.")
-        final_link = find_direct_link(tool_data)
+        search_note = ""
+        try:
+            # The search client is blocking, so keep it off the event loop.
+            final_link = await asyncio.to_thread(find_direct_link, tool_data)
+        except ServiceDegradedError as e:
+            logger.warning(f"Link search skipped for {reel_url}: {e}")
+            final_link = None
+            search_note = "\n⚠️ Link search is degraded right now, so this is a Google search link instead of a direct one."
 
         # Handle the "Content Extracted" case for resources
         if final_link == "Content Extracted from Video.":
              final_message = f"Tool detected: {tool_data.get('tool_name')}\n\n⚠️ **Direct Link Not Found** (It might be a resource).\n✅ **Smart Capture Successful:**\nI read the content directly from the video for you:\n\n`{tool_data.get('extracted_content')}`\n\n_(Note: This is an AI transcription.)_"
         elif not final_link:
             final_link = f"https://www.google.com/search?q={urllib.parse.quote_plus(tool_data.get('tool_name'))}"
-            final_message = f"Tool detected: {tool_data.get('tool_name')}\nDirect link ↓\n{final_link}\n\n(no like/follow/comment needed)"
+            final_message = f"Tool detected: {tool_data.get('tool_name')}\nDirect link ↓\n{final_link}\n\n(no like/follow/comment needed){search_note}"
         else:
             final_message = f"Tool detected: {tool_data.get('tool_name')}\nDirect link ↓\n{final_link}\n\n(no like/follow/comment needed)"
         
-        return {
+        result = {
             "tool_name": tool_data.get("tool_name"),
             "final_message": final_message,
-            "category": tool_data.get("category")
+            "category": tool_data.get("category"),
+            "uploader": video_info.get("uploader"),
         }
+        # A degraded search only produced a fallback link; don't serve it from cache.
+        if not search_note:
+            result_cache.put(cache_key, result)
+            if content_key:
+                result_cache.put(content_key, result)
+        return result
     finally:
-        if temp_video_path and os.path.exists(temp_video_path):
-            logger.info(f"Cleaning up temporary file: {temp_video_path}")
-            try:
-                os.remove(temp_video_path)
-            except OSError as e:
-                logger.error(f"Error removing temp file {temp_video_path}: {e}")
\ No newline at end of file
+        if temp_video_path and temp_video_path != "TIMEOUT":
+            await media_buffers.release(temp_video_path)
\ No newline at end of file
@@ -1,6 +1,5 @@
 import os
 import time
-from instagrapi import Client
 from dotenv import load_dotenv
 import json
 import http.cookiejar # Import http.cookiejar
@@ -36,7 +35,11 @@ def refresh_session() -> bool: # Added type hint for clarity
     if not all([USERNAME, PASSWORD, TOTP_SEED]):
         print("ERROR: Instagram credentials (IG_USERNAME, IG_PASSWORD, IG_TOTP_SEED) are not set in your environment. Cannot refresh session.")
         return False
-        
+
+    # instagrapi (and its pydantic models) is only needed here, so it is
+    # imported lazily to keep it off the bot's startup path.
+    from instagrapi import Client
+
     cl = Client()
     
     # 1. Set Proxy (CRITICAL for DigitalOcean)
@@ -0,0 +1,251 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from .config import (
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_SECONDS,
+    RETRY_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+)
+from .metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+# Breaker states. "half_open" lets exactly one trial call through after the
+# reset timeout; its outcome decides whether the breaker closes or re-opens.
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class ServiceDegradedError(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+    def __init__(self, service: str, retry_after: float):
+        self.service = service
+        self.retry_after = retry_after
+        super().__init__(f"{service} is degraded, retry in {retry_after:.0f}s")
+
+
+class TransientError(Exception):
+    """A failure worth retrying (timeouts, 5xx, rate limits, flaky subprocesses)."""
+
+
+# --- Circuit Breaker ---
+class CircuitBreaker:
+    """
+    Per-dependency circuit breaker. Opens after `failure_threshold` consecutive
+    failures and fails fast until `reset_timeout` seconds have passed.
+    Thread-safe, so it can guard calls made from asyncio.to_thread workers.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_timeout: float = BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        # Counters exported as metrics
+        self.calls = 0
+        self.failures = 0
+        self.rejections = 0
+        self.opens = 0
+
+    def before_call(self):
+        """Raises ServiceDegradedError if the call must not go through."""
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+                if remaining > 0:
+                    self.rejections += 1
+                    raise ServiceDegradedError(self.name, remaining)
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+                logger.info(f"Circuit breaker '{self.name}' half-open, allowing a trial call.")
+            if self.state == HALF_OPEN:
+                if self._trial_in_flight:
+                    self.rejections += 1
+                    raise ServiceDegradedError(self.name, self.reset_timeout)
+                self._trial_in_flight = True
+            self.calls += 1
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"Circuit breaker '{self.name}' closed again.")
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_cancelled(self):
+        """Releases a half-open trial slot without judging the dependency."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opens += 1
+                    logger.warning(f"Circuit breaker '{self.name}' OPEN after {self.consecutive_failures} consecutive failures.")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def samples(self):
+        labels = {"service": self.name}
+        return [
+            ("reellink_breaker_state", labels, _STATE_VALUES[self.state]),
+            ("reellink_breaker_calls_total", labels, self.calls),
+            ("reellink_breaker_failures_total", labels, self.failures),
+            ("reellink_breaker_rejections_total", labels, self.rejections),
+            ("reellink_breaker_opens_total", labels, self.opens),
+        ]
+
+
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Returns the shared breaker for a dependency, creating it on first use."""
+    with _BREAKERS_LOCK:
+        if name not in _BREAKERS:
+            _BREAKERS[name] = CircuitBreaker(name)
+        return _BREAKERS[name]
+
+
+# --- Retries ---
+_retry_counts = {}
+_hedge_counts = {}
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2**attempt))."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+def _is_retryable(exc: Exception, retry_if) -> bool:
+    if isinstance(exc, ServiceDegradedError):
+        return False
+    if isinstance(exc, TransientError):
+        return True
+    return bool(retry_if and retry_if(exc))
+
+def _record_error(breaker: CircuitBreaker, exc: Exception, counts_as_failure) -> bool:
+    """Updates the breaker for a failed call; returns False if `exc` is the request's fault."""
+    if counts_as_failure and not counts_as_failure(exc):
+        # The dependency answered; the request itself was bad (e.g. a 404 for an
+        # expired URL). Reaching it at all says it is healthy.
+        breaker.record_success()
+        return False
+    breaker.record_failure()
+    return True
+
+async def resilient_call(breaker: CircuitBreaker, func, *args, retry_if=None, counts_as_failure=None,
+                         attempts: int = RETRY_ATTEMPTS, **kwargs):
+    """
+    Awaits `func(*args, **kwargs)` through `breaker`, retrying TransientError (or
+    anything `retry_if(exc)` accepts) with jittered backoff. Every other exception
+    is raised immediately. Exceptions count as breaker failures unless
+    `counts_as_failure(exc)` says otherwise; those are raised without a retry.
+    """
+    for attempt in range(attempts):
+        breaker.before_call()
+        try:
+            result = await func(*args, **kwargs)
+        except asyncio.CancelledError:
+            # A cancelled hedge says nothing about the dependency's health.
+            breaker.record_cancelled()
+            raise
+        except Exception as e:
+            if not _record_error(breaker, e, counts_as_failure):
+                raise
+            if attempt + 1 >= attempts or not _is_retryable(e, retry_if):
+                raise
+            delay = backoff_delay(attempt)
+            _retry_counts[breaker.name] = _retry_counts.get(breaker.name, 0) + 1
+            logger.warning(f"{breaker.name} call failed ({e}); retry {attempt + 1}/{attempts - 1} in {delay:.1f}s.")
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+def resilient_call_sync(breaker: CircuitBreaker, func, *args, retry_if=None, counts_as_failure=None,
+                        attempts: int = RETRY_ATTEMPTS, **kwargs):
+    """Blocking twin of resilient_call(), for code that already runs in a worker thread."""
+    for attempt in range(attempts):
+        breaker.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if not _record_error(breaker, e, counts_as_failure):
+                raise
+            if attempt + 1 >= attempts or not _is_retryable(e, retry_if):
+                raise
+            delay = backoff_delay(attempt)
+            _retry_counts[breaker.name] = _retry_counts.get(breaker.name, 0) + 1
+            logger.warning(f"{breaker.name} call failed ({e}); retry {attempt + 1}/{attempts - 1} in {delay:.1f}s.")
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+
+# --- Hedged Requests ---
+async def hedged(name: str, factory, hedge_delay: float):
+    """
+    Runs `factory()` and, if it hasn't finished after `hedge_delay` seconds,
+    starts a second copy. Returns the first successful result and cancels the
+    loser. With hedge_delay <= 0 this is just `await factory()`.
+    """
+    first = asyncio.ensure_future(factory())
+    if hedge_delay <= 0:
+        return await first
+
+    pending = {first}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=hedge_delay)
+        if done:
+            return first.result()
+
+        logger.info(f"{name} is slow (> {hedge_delay:.1f}s); starting a hedged attempt.")
+        stats = _hedge_counts.setdefault(name, {"started": 0, "won": 0})
+        stats["started"] += 1
+        second = asyncio.ensure_future(factory())
+        pending = {first, second}
+        last_error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is second:
+                        stats["won"] += 1
+                    return task.result()
+                last_error = task.exception()
+        raise last_error
+    finally:
+        # Cancel the loser (or everything, if we were cancelled ourselves).
+        for task in pending:
+            task.cancel()
+
+
+# --- Metrics Export ---
+def _collect():
+    samples = []
+    for breaker in list(_BREAKERS.values()):
+        samples.extend(breaker.samples())
+    for name, count in _retry_counts.items():
+        samples.append(("reellink_retries_total", {"service": name}, count))
+    for name, stats in _hedge_counts.items():
+        samples.append(("reellink_hedges_started_total", {"service": name}, stats["started"]))
+        samples.append(("reellink_hedges_won_total", {"service": name}, stats["won"]))
+    return samples
+
+register_collector("resilience", _collect)
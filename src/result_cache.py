@@ -0,0 +1,87 @@
+import collections
+import logging
+import time
+from urllib.parse import urlparse
+from .config import RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_TTL_SECONDS
+from .links import match_link
+from .metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+# Tool names that mean "no usable answer"; those results are never cached.
+UNCACHEABLE_TOOL_NAMES = ("Error", "N/A")
+
+
+def canonical_reel_key(url: str) -> str:
+    """
+    Maps every form of the same reel to one key: the platform's canonical ID
+    (e.g. "instagram:C1a2B3c", "youtube:dQw4w9WgXcQ") when the URL is recognised,
+    else the lower-cased host without www./m. plus the path, with no query string,
+    fragment or trailing slash.
+    """
+    link = match_link(url.strip())
+    if link and link.canonical_id:
+        return link.canonical_id
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    return f"{host}{parsed.path.rstrip('/')}"
+
+
+class ResultCache:
+    """In-memory LRU of finished process_reel() results with a per-entry TTL."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()  # key -> (expires_at, result)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: str, result: dict):
+        if not result or result.get("tool_name") in UNCACHEABLE_TOOL_NAMES:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __contains__(self, key: str):
+        """True if `key` holds a live entry. Unlike get(), doesn't touch hit/miss stats or LRU order."""
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def expires_in(self, key: str):
+        """Seconds until `key` expires, or None if it isn't cached."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return entry[0] - time.monotonic()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+result_cache = ResultCache(RESULT_CACHE_TTL_SECONDS, RESULT_CACHE_MAX_ENTRIES)
+
+def _collect():
+    return [
+        ("reellink_result_cache_entries", {}, len(result_cache)),
+        ("reellink_result_cache_hits_total", {}, result_cache.hits),
+        ("reellink_result_cache_misses_total", {}, result_cache.misses),
+    ]
+
+register_collector("result_cache", _collect)
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import time
+import httpx
+from .config import (
+    DOWNLOAD_TIMEOUT,
+    GEMINI_API_KEY,
+    GEMINI_UPLOAD_CHUNK_BYTES,
+    GEMINI_UPLOAD_QUEUE_CHUNKS,
+)
+from .media_buffers import media_buffers
+from .metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+GEMINI_UPLOAD_URL = "https://generativelanguage.googleapis.com/upload/v1beta/files"
+# Non-final chunks must be a multiple of this, unless the server says otherwise.
+DEFAULT_CHUNK_GRANULARITY = 256 * 1024
+
+
+class StreamingUploadError(Exception):
+    """
+    The streamed upload failed. `download_complete` tells the caller whether the
+    disk copy is whole (so only the upload needs redoing) or must be re-downloaded.
+    """
+
+    def __init__(self, message: str, download_complete: bool):
+        super().__init__(message)
+        self.download_complete = download_complete
+
+
+class ResumableUpload:
+    """A Gemini Files API resumable upload session, fed chunk by chunk."""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.upload_url = None
+        self.granularity = DEFAULT_CHUNK_GRANULARITY
+        self.offset = 0
+        self.start_error = None  # why start() failed, chained onto the upload error
+
+    async def start(self, display_name: str, mime_type: str, total_bytes: int = None):
+        headers = {
+            "x-goog-api-key": GEMINI_API_KEY,
+            "X-Goog-Upload-Protocol": "resumable",
+            "X-Goog-Upload-Command": "start",
+            "X-Goog-Upload-Header-Content-Type": mime_type,
+        }
+        if total_bytes:
+            headers["X-Goog-Upload-Header-Content-Length"] = str(total_bytes)
+        response = await self.client.post(GEMINI_UPLOAD_URL, headers=headers, json={"file": {"display_name": display_name}})
+        response.raise_for_status()
+        self.upload_url = response.headers["X-Goog-Upload-URL"]
+        granularity = response.headers.get("X-Goog-Upload-Chunk-Granularity")
+        if granularity and granularity.isdigit():
+            self.granularity = int(granularity)
+
+    async def send(self, data: bytes, finalize: bool = False):
+        """Uploads `data` at the current offset. Returns the file resource on finalize."""
+        response = await self.client.post(
+            self.upload_url,
+            headers={
+                "X-Goog-Upload-Command": "upload, finalize" if finalize else "upload",
+                "X-Goog-Upload-Offset": str(self.offset),
+            },
+            content=data,
+        )
+        response.raise_for_status()
+        self.offset += len(data)
+        if finalize:
+            return response.json()["file"]
+
+
+async def stream_download_to_gemini(video_url: str, path: str, display_name: str) -> dict:
+    """
+    Downloads `video_url` and uploads it to Gemini at the same time.
+
+    Every downloaded chunk is written to `path` (the disk fallback) and handed
+    to the uploader through a bounded queue; the uploader sends requests of
+    GEMINI_UPLOAD_CHUNK_BYTES as soon as they fill up. Returns the Gemini file
+    resource ({"name", "uri", "state", ...}) plus timings. Raises
+    StreamingUploadError on failure.
+    """
+    chunks = asyncio.Queue(maxsize=GEMINI_UPLOAD_QUEUE_CHUNKS)
+    upload_failed = asyncio.Event()
+    started = time.perf_counter()
+    timings = {}
+
+    async with httpx.AsyncClient(timeout=DOWNLOAD_TIMEOUT) as client:
+        session = ResumableUpload(client)
+
+        async def download():
+            async with client.stream("GET", video_url, follow_redirects=True) as response:
+                response.raise_for_status()
+                content_length = response.headers.get("Content-Length")
+                total = int(content_length) if content_length and content_length.isdigit() else None
+                with media_buffers.open_writer(path) as writer:
+                    if total:
+                        writer.expect(total)
+                    # Open the upload session as soon as the size (if any) is known. If it
+                    # can't start, keep downloading: the disk copy is the fallback.
+                    try:
+                        await session.start(display_name, response.headers.get("Content-Type", "video/mp4"), total)
+                    except Exception as e:
+                        logger.warning(f"Could not start resumable upload session: {e}")
+                        session.start_error = e
+                        upload_failed.set()
+                    async for chunk in response.aiter_bytes():
+                        writer.write(chunk)
+                        if not upload_failed.is_set():
+                            await chunks.put(chunk)
+            timings["download_s"] = time.perf_counter() - started
+            await chunks.put(None)
+
+        async def upload():
+            pending = bytearray()
+            try:
+                while True:
+                    chunk = await chunks.get()
+                    if chunk is None:
+                        break
+                    if session.upload_url is None:
+                        raise RuntimeError("upload session did not start") from session.start_error
+                    pending += chunk
+                    step = max(session.granularity, GEMINI_UPLOAD_CHUNK_BYTES // session.granularity * session.granularity)
+                    if len(pending) >= step:
+                        ready = len(pending) // session.granularity * session.granularity
+                        await session.send(bytes(pending[:ready]))
+                        del pending[:ready]
+                if session.upload_url is None:
+                    raise RuntimeError("upload session did not start") from session.start_error
+                file_resource = await session.send(bytes(pending), finalize=True)
+                timings["upload_s"] = time.perf_counter() - started
+                return file_resource
+            except BaseException:
+                # Stop the producer from filling a queue nobody reads, and drain it.
+                upload_failed.set()
+                while not chunks.empty():
+                    chunks.get_nowait()
+                raise
+
+        download_task = asyncio.ensure_future(download())
+        upload_task = asyncio.ensure_future(upload())
+        try:
+            try:
+                await download_task
+            except Exception as e:
+                raise StreamingUploadError(f"download failed: {e}", download_complete=False) from e
+            try:
+                file_resource = await upload_task
+            except Exception as e:
+                raise StreamingUploadError(f"upload failed: {e}", download_complete=True) from e
+        finally:
+            # No-ops on success; on failure or cancellation nothing keeps running.
+            for task in (download_task, upload_task):
+                task.cancel()
+
+    file_resource["timings"] = timings
+    return file_resource
+
+
+# --- Pipeline Timing ---
+# Time from the start of the download until Gemini holds the whole video, per
+# mode, so the streamed path can be compared with the temp-file path.
+_video_ready = {"streamed": [0, 0.0], "temp_file": [0, 0.0]}
+
+def record_video_ready(mode: str, seconds: float):
+    stats = _video_ready.setdefault(mode, [0, 0.0])
+    stats[0] += 1
+    stats[1] += seconds
+
+def _collect():
+    samples = []
+    for mode, (count, total) in _video_ready.items():
+        samples.append(("reellink_video_ready_seconds_count", {"mode": mode}, count))
+        samples.append(("reellink_video_ready_seconds_sum", {"mode": mode}, round(total, 3)))
+    return samples
+
+register_collector("streaming_upload", _collect)
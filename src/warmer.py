@@ -0,0 +1,240 @@
+import array
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from datetime import datetime
+from .config import (
+    WARMER_ENABLED,
+    WARMER_HALF_LIFE_SECONDS,
+    WARMER_INTERVAL_SECONDS,
+    WARMER_MAX_JOBS_PER_HOUR,
+    WARMER_MIN_SCORE,
+    WARMER_OFFPEAK_HOURS,
+    WARMER_REFRESH_BEFORE_SECONDS,
+    WARMER_RETRY_SECONDS,
+)
+from .metrics import register_collector
+from .model_router import model_router
+from .result_cache import canonical_reel_key, result_cache
+
+logger = logging.getLogger(__name__)
+
+# How much a reel's score is boosted by its source account's recent popularity.
+ACCOUNT_BOOST = 0.5
+# Hot reels / accounts remembered by name (the sketch itself has no keys).
+MAX_CANDIDATES = 500
+MAX_ACCOUNTS = 200
+
+
+# --- Trend Tracking ---
+class DecayingCountMinSketch:
+    """
+    Count-min sketch whose counters halve every `half_life` seconds, so the
+    estimates approximate "requests in the last hour or so" in fixed memory.
+    Decay is applied lazily to the whole table when the sketch is touched.
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4, half_life: float = WARMER_HALF_LIFE_SECONDS):
+        self.width = width
+        self.depth = depth
+        self.half_life = half_life
+        self._rows = [array.array("d", [0.0]) * width for _ in range(depth)]
+        self._last_decay = time.monotonic()
+
+    def _indexes(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=8 * self.depth).digest()
+        for row in range(self.depth):
+            yield row, int.from_bytes(digest[row * 8:(row + 1) * 8], "little") % self.width
+
+    def _decay(self):
+        elapsed = time.monotonic() - self._last_decay
+        # Only bother once the factor is meaningful (~1% of a half-life).
+        if elapsed < self.half_life / 100:
+            return
+        factor = math.pow(0.5, elapsed / self.half_life)
+        for row in self._rows:
+            for i, value in enumerate(row):
+                if value:
+                    row[i] = value * factor
+        self._last_decay = time.monotonic()
+
+    def add(self, key: str, count: float = 1.0) -> float:
+        """Adds `count` for `key` and returns its new estimate."""
+        self._decay()
+        estimate = math.inf
+        for row, index in self._indexes(key):
+            self._rows[row][index] += count
+            estimate = min(estimate, self._rows[row][index])
+        return estimate
+
+    def estimate(self, key: str) -> float:
+        self._decay()
+        return min(self._rows[row][index] for row, index in self._indexes(key))
+
+
+class TrendTracker:
+    """Tracks how often each canonical reel is requested, and which accounts post the hot ones."""
+
+    def __init__(self):
+        self.reels = DecayingCountMinSketch()
+        self.accounts = DecayingCountMinSketch(width=512)
+        self.candidates = {}  # canonical key -> {"url": str, "account": str|None, "failed_at": float|None}
+        self.hot_accounts = {}  # account -> last estimate, bounded to MAX_ACCOUNTS
+
+    def record_request(self, url: str):
+        key = canonical_reel_key(url)
+        self.reels.add(key)
+        candidate = self.candidates.setdefault(key, {"url": url, "account": None, "failed_at": None})
+        if candidate["account"]:
+            self._bump_account(candidate["account"])
+        if len(self.candidates) > MAX_CANDIDATES:
+            coldest = min(self.candidates, key=self.reels.estimate)
+            del self.candidates[coldest]
+
+    def record_account(self, url: str, account: str):
+        """Remembers which account posted a reel once the pipeline has found out."""
+        if not account:
+            return
+        candidate = self.candidates.get(canonical_reel_key(url))
+        if candidate and not candidate["account"]:
+            candidate["account"] = account
+            self._bump_account(account)
+
+    def record_warm_failure(self, url: str):
+        """Keeps a reel whose warm-up left nothing cached (N/A, error) from being picked again right away."""
+        candidate = self.candidates.get(canonical_reel_key(url))
+        if candidate:
+            candidate["failed_at"] = time.monotonic()
+
+    def needs_warming(self, key: str) -> bool:
+        expires_in = result_cache.expires_in(key)
+        return expires_in is None or expires_in <= WARMER_REFRESH_BEFORE_SECONDS
+
+    def _bump_account(self, account: str):
+        self.hot_accounts[account] = self.accounts.add(account)
+        if len(self.hot_accounts) > MAX_ACCOUNTS:
+            coldest = min(self.hot_accounts, key=self.hot_accounts.get)
+            del self.hot_accounts[coldest]
+
+    def score(self, key: str) -> float:
+        candidate = self.candidates.get(key) or {}
+        account = candidate.get("account")
+        account_heat = self.accounts.estimate(account) if account else 0.0
+        return self.reels.estimate(key) + ACCOUNT_BOOST * account_heat
+
+    def next_to_warm(self):
+        """Returns the URL of the hottest reel that is uncached or about to expire, if any."""
+        best_key, best_score = None, WARMER_MIN_SCORE
+        retry_after = time.monotonic() - WARMER_RETRY_SECONDS
+        for key, candidate in self.candidates.items():
+            if not self.needs_warming(key):
+                continue
+            if candidate["failed_at"] is not None and candidate["failed_at"] > retry_after:
+                continue
+            score = self.score(key)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return self.candidates[best_key]["url"] if best_key else None
+
+
+# --- Background Warmer ---
+def parse_hours(spec: str):
+    """Parses "1-7" into a set of hours (wrapping midnight, e.g. "22-5"); empty means all."""
+    if not spec.strip():
+        return set(range(24))
+    start, _, end = spec.partition("-")
+    start, end = int(start), int(end or start)
+    if start <= end:
+        return set(range(start, end + 1))
+    return set(range(start, 24)) | set(range(0, end + 1))
+
+
+class CacheWarmer:
+    """
+    Spends spare Gemini / Custom Search quota on precomputing results for reels
+    that are likely to be requested again. Warm-up always yields to users: it
+    only starts while no user job is running and every model has spare RPM
+    budget, a user job arriving mid-warm cancels it, and its Gemini calls wait
+    for user calls (see ModelRouter.generate).
+    """
+
+    def __init__(self, tracker: TrendTracker):
+        self.tracker = tracker
+        self.offpeak_hours = parse_hours(WARMER_OFFPEAK_HOURS)
+        self.active_user_jobs = 0
+        self._task = None
+        self._job_times = []
+        self.jobs_completed = 0
+        self.jobs_preempted = 0
+
+    def user_job_started(self):
+        self.active_user_jobs += 1
+        if self._task and not self._task.done():
+            logger.info("User job arrived; pre-empting cache warm-up.")
+            self._task.cancel()
+
+    def user_job_finished(self):
+        self.active_user_jobs = max(0, self.active_user_jobs - 1)
+
+    def _has_budget(self) -> bool:
+        hour_ago = time.monotonic() - 3600
+        self._job_times = [t for t in self._job_times if t > hour_ago]
+        return len(self._job_times) < WARMER_MAX_JOBS_PER_HOUR
+
+    def _can_run(self) -> bool:
+        return (
+            self.active_user_jobs == 0
+            and datetime.now().hour in self.offpeak_hours
+            and self._has_budget()
+            and model_router.has_spare_budget()
+        )
+
+    async def run(self):
+        # Imported here to avoid a cycle: the processor uses the result cache too.
+        from .processor import process_reel
+
+        if not WARMER_ENABLED:
+            return
+        logger.info(f"Cache warmer started (off-peak hours: {WARMER_OFFPEAK_HOURS or 'all'}).")
+        while True:
+            await asyncio.sleep(WARMER_INTERVAL_SECONDS)
+            if not self._can_run():
+                continue
+            url = self.tracker.next_to_warm()
+            if not url:
+                continue
+
+            logger.info(f"Warming cache for trending reel {url}.")
+            self._job_times.append(time.monotonic())
+            self._task = asyncio.create_task(process_reel(url, refresh=True, background=True))
+            # asyncio.wait (not await) so a pre-empted job doesn't cancel this loop.
+            await asyncio.wait({self._task})
+            if self._task.cancelled():
+                self.jobs_preempted += 1
+                continue
+            try:
+                result = self._task.result()
+                self.tracker.record_account(url, result.get("uploader"))
+                self.jobs_completed += 1
+            except Exception as e:
+                logger.warning(f"Cache warm-up failed for {url}: {e}")
+            finally:
+                if self.tracker.needs_warming(canonical_reel_key(url)):
+                    self.tracker.record_warm_failure(url)
+                self._task = None
+
+
+trend_tracker = TrendTracker()
+cache_warmer = CacheWarmer(trend_tracker)
+
+def _collect():
+    return [
+        ("reellink_warmer_candidates", {}, len(trend_tracker.candidates)),
+        ("reellink_warmer_jobs_completed_total", {}, cache_warmer.jobs_completed),
+        ("reellink_warmer_jobs_preempted_total", {}, cache_warmer.jobs_preempted),
+        ("reellink_user_jobs_active", {}, cache_warmer.active_user_jobs),
+    ]
+
+register_collector("warmer", _collect)
@@ -0,0 +1,124 @@
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from .config import WORKER_MAX_TASKS_PER_CHILD, WORKER_POOL_SIZE, WORKER_TASK_TIMEOUT
+from .metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessPoolService:
+    """
+    Shared process pool for CPU-bound work (hashing, parsing, media processing),
+    so it never stalls the Telegram event loop.
+
+    - Created lazily on first use, with "spawn" workers (the bot process has
+      logging/scheduler threads, which don't mix with fork).
+    - Each task gets a timeout; a task that overruns takes its pool down with it,
+      since a running process-pool task can't be cancelled individually.
+    - Workers are recycled after `max_tasks` tasks by swapping in a fresh pool
+      and letting the old one drain.
+    - With max_workers=0 tasks run in a thread instead.
+    """
+
+    def __init__(self, max_workers: int, task_timeout: float, max_tasks: int):
+        self.max_workers = max_workers
+        self.task_timeout = task_timeout
+        self.max_tasks = max_tasks
+        self._pool = None
+        self._pool_tasks = 0
+        self._lock = threading.Lock()
+        # Metrics
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.recycles = 0
+        self.busy_seconds = 0.0
+
+    def _get_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is not None and self._pool_tasks >= self.max_tasks:
+                logger.info(f"Recycling worker pool after {self._pool_tasks} tasks.")
+                self._pool.shutdown(wait=False)
+                self._pool = None
+                self.recycles += 1
+            if self._pool is None:
+                self._pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self._pool_tasks = 0
+            self._pool_tasks += 1
+            return self._pool
+
+    def _discard_pool(self, pool, reason: str):
+        """Kills a pool whose worker is hung or dead; the next task starts a new one."""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+                self.recycles += 1
+        logger.warning(f"Discarding worker pool: {reason}")
+        # ProcessPoolExecutor has no public way to stop a running task.
+        for process in list(getattr(pool, "_processes", {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func, *args, timeout: float = None):
+        """Runs `func(*args)` in a worker and returns its result (raises asyncio.TimeoutError on overrun)."""
+        timeout = timeout or self.task_timeout
+        started = time.perf_counter()
+        self.queued += 1
+        try:
+            if self.max_workers <= 0:
+                result = await asyncio.wait_for(asyncio.to_thread(func, *args), timeout)
+            else:
+                pool = self._get_pool()
+                future = pool.submit(func, *args)
+                try:
+                    result = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+                except asyncio.TimeoutError:
+                    self._discard_pool(pool, f"{func.__name__} exceeded {timeout:.0f}s")
+                    raise
+                except BrokenProcessPool as e:
+                    self._discard_pool(pool, f"worker died ({e})")
+                    raise
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.queued -= 1
+            self.busy_seconds += time.perf_counter() - started
+        self.completed += 1
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+worker_pool = ProcessPoolService(WORKER_POOL_SIZE, WORKER_TASK_TIMEOUT, WORKER_MAX_TASKS_PER_CHILD)
+atexit.register(worker_pool.shutdown)
+
+def _collect():
+    return [
+        ("reellink_worker_pool_size", {}, worker_pool.max_workers),
+        ("reellink_worker_queue_depth", {}, worker_pool.queued),
+        ("reellink_worker_tasks_completed_total", {}, worker_pool.completed),
+        ("reellink_worker_tasks_failed_total", {}, worker_pool.failed),
+        ("reellink_worker_tasks_timed_out_total", {}, worker_pool.timeouts),
+        ("reellink_worker_pool_recycles_total", {}, worker_pool.recycles),
+        ("reellink_worker_task_seconds_total", {}, round(worker_pool.busy_seconds, 3)),
+    ]
+
+register_collector("workers", _collect)
@@ -0,0 +1,75 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.links import extract_reel_links, match_link
+
+
+def ids(text):
+    return [link.canonical_id for link in extract_reel_links(text)]
+
+
+class LinkMatchingTests(unittest.TestCase):
+    def test_mixed_case_host_next_to_lowercase_link(self):
+        text = "https://www.instagram.com/reel/ABC123/ and https://Instagram.com/reel/XYZ789/"
+        self.assertEqual(ids(text), ["instagram:ABC123", "instagram:XYZ789"])
+
+    def test_mixed_case_host_alone(self):
+        self.assertEqual(ids("look: HTTPS://WWW.INSTAGRAM.COM/reel/ABC123/"), ["instagram:ABC123"])
+
+    def test_capitalised_scheme_or_www_with_lowercase_host(self):
+        # Phone keyboards capitalise the first letter of a message.
+        for text in (
+            "Https://www.instagram.com/reel/ABC123/",
+            "HTTPS://WWW.instagram.com/reel/ABC123/",
+            "Www.instagram.com/reel/ABC123/",
+        ):
+            links = extract_reel_links(text)
+            self.assertEqual([link.canonical_id for link in links], ["instagram:ABC123"], text)
+            self.assertEqual(links[0].original, text)
+        self.assertEqual(ids("Https://youtu.be/dQw4w9WgXcQ"), ["youtube:dQw4w9WgXcQ"])
+
+    def test_instagram_forms(self):
+        text = (
+            "https://www.instagram.com/reel/AAA111/?igsh=abc "
+            "https://instagram.com/reels/BBB222 "
+            "instagram.com/p/CCC333/"
+        )
+        self.assertEqual(ids(text), ["instagram:AAA111", "instagram:BBB222", "instagram:CCC333"])
+
+    def test_youtube_forms(self):
+        text = (
+            "https://youtu.be/dQw4w9WgXcQ?si=xyz "
+            "https://m.youtube.com/watch?v=aaaaaaaaaaa&feature=share "
+            "https://www.youtube.com/watch?feature=share&v=bbbbbbbbbbb "
+            "https://www.youtube.com/shorts/ccccccccccc"
+        )
+        self.assertEqual(ids(text), ["youtube:dQw4w9WgXcQ", "youtube:aaaaaaaaaaa", "youtube:bbbbbbbbbbb", "youtube:ccccccccccc"])
+
+    def test_tiktok_forms(self):
+        link = match_link("https://www.tiktok.com/@user.1/video/7234567890123456789?lang=en")
+        self.assertEqual(link.canonical_id, "tiktok:7234567890123456789")
+        short = match_link("https://vm.tiktok.com/ZMabc123/")
+        self.assertTrue(short.needs_resolution)
+        self.assertIsNone(short.canonical_id)
+
+    def test_trailing_punctuation(self):
+        for suffix in (".", ",", "!", "?", ")", "..."):
+            links = extract_reel_links(f"(see https://www.instagram.com/reel/ABC123/{suffix}")
+            self.assertEqual([link.original for link in links], ["https://www.instagram.com/reel/ABC123/"], suffix)
+        self.assertEqual(ids("https://youtu.be/dQw4w9WgXcQ."), ["youtube:dQw4w9WgXcQ"])
+
+    def test_duplicates_are_removed(self):
+        text = "instagram.com/reel/ABC123 https://www.instagram.com/reels/ABC123/?igsh=1 https://youtu.be/dQw4w9WgXcQ"
+        self.assertEqual(ids(text), ["instagram:ABC123", "youtube:dQw4w9WgXcQ"])
+
+    def test_lookalike_hosts_and_plain_text(self):
+        self.assertEqual(ids("https://evilinstagram.com/reel/ABC123/"), [])
+        self.assertEqual(ids("https://example.com/instagram.com/reel/ABC123/"), [])
+        self.assertEqual(ids("I saw it on Instagram and YouTube"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()